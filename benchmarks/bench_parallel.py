@@ -0,0 +1,39 @@
+"""Measures how the throughput of convert_parallel scales with the number of worker processes.
+Usage: python benchmarks/bench_parallel.py [-n ROWS] [--jobs 1,2,4,8]"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from umschriftpy import Format  # noqa: E402
+from umschriftpy.convert import convert_strings  # noqa: E402
+from umschriftpy.parallel import convert_parallel  # noqa: E402
+
+SAMPLES = ["Htp dj nsw Wp-WAwt nb tA Dsr", "DHw.tj-nfr", "aA-ptH", "Imn-m-HA.t", "sA-nb=f", "jmj-r pr wr", "Xrj-Hb Hrj-tp",
+           "sS nsw mAa mrj=f"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--rows", type=int, default=400000)
+    parser.add_argument("--jobs", default=",".join(str(2 ** i) for i in range(
+        (os.cpu_count() or 1).bit_length())))
+    parser.add_argument("--batch-size", type=int, default=4096)
+    args = parser.parse_args()
+    strings = [SAMPLES[i % len(SAMPLES)] + " %d" % i for i in range(args.rows)]
+    start = time.perf_counter()
+    convert_strings(strings, Format.TRANSLITERATION)
+    results = {"serial": args.rows / (time.perf_counter() - start)}
+    for jobs in map(int, args.jobs.split(",")):
+        start = time.perf_counter()
+        convert_parallel(strings, Format.TRANSLITERATION,
+                         jobs=jobs, batch_size=args.batch_size)
+        results["jobs=%d" % jobs] = args.rows / (time.perf_counter() - start)
+    print(json.dumps({"rows_per_second": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
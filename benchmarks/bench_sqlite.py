@@ -0,0 +1,60 @@
+"""Benchmarks the SQLite integration over a large table of synthetic names and titles.
+Usage: python benchmarks/bench_sqlite.py [-n ROWS] [--database FILE]"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from umschriftpy import UmFilter, from_unicode  # noqa: E402
+from umschriftpy.sqlite import register  # noqa: E402
+
+KEY = "umsch_key(name, 'unicode', 'CLEAN,LOWER')"
+
+
+def timed(results: dict, name: str, function):
+    start = time.perf_counter()
+    res = function()
+    results[name] = time.perf_counter() - start
+    return res
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--rows", type=int, default=1000000)
+    parser.add_argument("--database", default=":memory:")
+    args = parser.parse_args()
+    results = {}
+    connection = register(sqlite3.connect(args.database))
+    names = synthetic.records(args.rows)
+    connection.execute("DROP TABLE IF EXISTS names")
+    connection.execute("CREATE TABLE names(name TEXT)")
+    timed(results, "insert", lambda: connection.executemany(
+        "INSERT INTO names VALUES(?)", ((n,) for n in names)))
+    timed(results, "create_expression_index", lambda: connection.execute(
+        "CREATE INDEX names_key ON names(%s)" % KEY))
+    probe = from_unicode(names[len(names) // 2]).filter(
+        UmFilter.CLEAN | UmFilter.LOWER).to_pseudo()
+    timed(results, "indexed_lookup_x1000", lambda: [connection.execute(
+        "SELECT count(*) FROM names WHERE %s = ?" % KEY, (probe,)).fetchone() for _ in range(1000)])
+    timed(results, "order_by_key", lambda: connection.execute(
+        "SELECT name FROM names ORDER BY %s" % KEY).fetchall())
+    timed(results, "group_by_key", lambda: connection.execute(
+        "SELECT %s, count(*) FROM names GROUP BY %s" % (KEY, KEY)).fetchall())
+    timed(results, "order_by_collation", lambda: connection.execute(
+        "SELECT umsch_import(name, 'unicode') AS p FROM names ORDER BY p COLLATE UMSCHRIFT").fetchall())
+
+    def python_side():
+        rows = connection.execute("SELECT name FROM names").fetchall()
+        return sorted(from_unicode(r[0]).filter(UmFilter.CLEAN | UmFilter.LOWER).to_pseudo() for r in rows)
+    timed(results, "python_side_sort", python_side)
+    print(json.dumps({"rows": args.rows, "seconds": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
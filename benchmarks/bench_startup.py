@@ -0,0 +1,47 @@
+"""Measures the cold import time of umschriftpy and the latency of the first conversion per format.
+Every measurement runs in a fresh interpreter. Usage: python benchmarks/bench_startup.py [-n RUNS]"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+start = time.perf_counter()
+import umschriftpy
+from umschriftpy import Format, UmschString
+imported = time.perf_counter()
+samples = {Format.UNICODE: "ḥtp dꞽ nsw", Format.UMSCHRIFT_TTN: "Htp dj nsw", Format.TRANSLITERATION: "Htp dj nsw",
+           Format.TRLIT_CG_TIMES: "Htp di nsw", Format.TRLIT_CG_TIMES_2023: "Htp di nsw"}
+first = {}
+for source_format, sample in samples.items():
+    t = time.perf_counter()
+    UmschString(sample, source_format).to_unicode()
+    first[source_format.name] = time.perf_counter() - t
+print(json.dumps({"import": imported - start, "first_conversion": first}))
+"""
+
+
+def run_probe():
+    output = subprocess.run([sys.executable, "-c", PROBE], cwd=ROOT,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--runs", type=int, default=20)
+    args = parser.parse_args()
+    runs = [run_probe() for _ in range(args.runs)]
+    result = {"import_ms": statistics.median(run["import"] for run in runs) * 1000,
+              "first_conversion_ms": {name: statistics.median(run["first_conversion"][name] for run in runs) * 1000
+                                      for name in runs[0]["first_conversion"]}}
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
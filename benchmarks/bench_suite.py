@@ -0,0 +1,122 @@
+"""Benchmark suite for the conversion hot paths of umschriftpy.
+
+Run:      python benchmarks/bench_suite.py [-n RECORDS] [-o results.json]
+Compare:  python benchmarks/bench_suite.py --compare baseline.json results.json [--threshold 0.1]
+
+Every benchmark reports the best time of several repeats; the comparison flags benchmarks that got slower
+by more than the threshold and exits with status 1 if there are any."""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import synthetic  # noqa: E402
+from umschriftpy import Format, UmExport, UmFilter, UmImport, UmschString, from_many, from_unicode, to_unicode_many  # noqa: E402
+
+IMPORT_FORMATS = [f for f in Format if f != Format.COMMON_D]
+EXPORT_FLAGS = {"default": UmExport(0), "K_WITH_DOT|J_FOR_YOD": UmExport.K_WITH_DOT | UmExport.J_FOR_YOD,
+                "JJ_FOR_DOUBLE_YOD|REPLACE_I_WITH_DIAERESIS": UmExport.JJ_FOR_DOUBLE_YOD | UmExport.REPLACE_I_WITH_DIAERESIS}
+FILTER_FLAGS = {"CLEAN": UmFilter.CLEAN, "LOWER": UmFilter.LOWER, "FACULTATIVE": UmFilter.FACULTATIVE,
+                "CLEAN|HYPHENS|LOWER": UmFilter.CLEAN | UmFilter.HYPHENS | UmFilter.LOWER}
+
+
+def measure(function, repeat: int):  # best time of one call in seconds
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def run(records: int, repeat: int):
+    unicode_strings = synthetic.records(records)
+    items = [from_unicode(s) for s in unicode_strings]
+    results = {}
+
+    def add(name, function, count=records):
+        seconds = measure(function, repeat)
+        results[name] = {"seconds": seconds, "per_second": count / seconds}
+
+    for source_format in IMPORT_FORMATS:
+        strings = synthetic.encode(unicode_strings, source_format)
+        for flags in (UmImport(0), UmImport.S_FOR_Z):
+            suffix = "" if not flags else "|S_FOR_Z"
+            add("import/%s%s" % (source_format.name, suffix),
+                lambda: [UmschString(s, source_format, flags) for s in strings])
+        add("import_many/%s" % source_format.name,
+            lambda: from_many(strings, source_format))
+    for name, flags in EXPORT_FLAGS.items():
+        add("export/to_unicode/%s" % name,
+            lambda: [item.to_unicode(flags) for item in items])
+        add("export/to_transliteration/%s" % name,
+            lambda: [item.to_transliteration(flags) for item in items])
+        add("export/to_unicode_many/%s" % name,
+            lambda: to_unicode_many(items, flags))
+    add("export/to_pseudo", lambda: [item.to_pseudo() for item in items])
+    for name, flags in FILTER_FLAGS.items():
+        add("filter/%s" % name, lambda: [item.filter(flags) for item in items])
+    for length in (100, 10000):
+        text = from_unicode(" ".join(unicode_strings)[:length])
+        for pattern_length in (1, 4, 16):
+            pattern = text[length // 2:length // 2 + pattern_length]
+            add("search/find/%d/%d" % (length, pattern_length),
+                lambda: text.find(pattern), 1)
+            add("search/find_all/%d/%d" % (length, pattern_length),
+                lambda: text.find_all(pattern), 1)
+            add("search/replace/%d/%d" % (length, pattern_length),
+                lambda: text.replace(pattern, from_unicode("nfr")), 1)
+    add("sort/sorted", lambda: sorted(items))
+    filtered = [item.filter(UmFilter.CLEAN | UmFilter.LOWER)
+                for item in items]
+    add("sort/sorted_filtered", lambda: sorted(filtered))
+    return {"records": records, "python": platform.python_version(), "results": results}
+
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Returns a list of (name, baseline seconds, current seconds, relative change) for all regressions."""
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        before = baseline["results"][name]["seconds"]
+        change = result["seconds"] / before - 1
+        print("%-60s %12.6f %12.6f %+7.1f%%" %
+              (name, before, result["seconds"], change * 100))
+        if change > threshold:
+            regressions.append((name, before, result["seconds"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--records", type=int, default=10000)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    parser.add_argument("-o", "--output", help="write the results to a JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"))
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (default: 0.1)")
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for name, before, after, change in regressions:
+            print("REGRESSION %s: %.6f s -> %.6f s (%+.1f%%)" %
+                  (name, before, after, change * 100))
+        return 1 if regressions else 0
+    results = run(args.records, args.repeat)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,45 @@
+"""Synthetic generator of Egyptian personal names and titles for benchmarks, in any of the supported input formats."""
+import random
+
+from umschriftpy import Format, from_unicode
+from umschriftpy.umschriftpy import IMPORT_DICT
+
+GODS = ["ꞽmn", "rꜥ", "ptḥ", "ḥr", "ḏḥwtꞽ", "wp-wꜣwt", "sbk", "ḫnmw", "mnṯw", "ꞽnpw", "ḥwt-ḥr", "nt", "ꞽtm", "ꞽnḥr"]
+ELEMENTS = ["nfr", "ḥtp", "ms", "m-ḥꜣ.t", "ꜥnḫ", "sꜣ", "sꜣ.t", "mrꞽ", "ꞽꞽ", "snb", "wsr", "nḫt", "ꞽb", "ḏd", "ḫꜥ", "kꜣ",
+            "ꞽ(w)⸗f", "ꞽr.n", "n⸗ꞽ", "ꜥꜣ", "šps", "wḏꜣ", "ḥꜥp", "s.t", "ẖnm", "mꜣꜥ", "ḥm", "y", "ꞽï", "(ꞽ)"]
+TITLES = ["ꞽmꞽ-rꜣ pr wr", "ẖrꞽ-ḥb ḥrꞽ-tp", "sš nsw", "ḥꜣ.tꞽ-ꜥ", "smr wꜥ.tꞽ", "ꞽrꞽ-pꜥ.t", "ḥm-nṯr", "wꜥb", "ꞽmꞽ-rꜣ mšꜥ",
+          "sš ḥsb ꞽt", "ḥrꞽ-ḥꜣb", "ꞽmꞽ-rꜣ ḫtm.t", "s(ꞽ) ꞽmꞽ-rꜣ", "[ḥm-nṯr] tpꞽ", "⸢ꞽmꞽ-rꜣ⸣ šnw.tꞽ"]
+
+
+def name(rng: random.Random):
+    parts = [rng.choice(ELEMENTS) for _ in range(rng.randint(0, 2))]
+    parts.insert(rng.randint(0, len(parts)), rng.choice(GODS))
+    res = "-".join(parts)
+    return res[0].upper() + res[1:] if rng.random() < 0.3 else res
+
+
+def title(rng: random.Random):
+    return " ".join(rng.choice(TITLES) for _ in range(rng.randint(1, 3)))
+
+
+def records(count: int, seed: int = 0):
+    """Returns count Unicode strings: a mix of names, titles and titles followed by names."""
+    rng = random.Random(seed)
+    generators = [name, title, lambda r: title(r) + " " + name(r)]
+    return [rng.choice(generators)(rng) for _ in range(count)]
+
+
+def _reverse_table(source_format: Format):
+    table = {}
+    for char, code in sorted(IMPORT_DICT[source_format].items(), reverse=True):
+        table[code] = char
+    return table
+
+
+def encode(strings, source_format: Format):
+    """Re-encodes Unicode strings in a legacy font format, so that importing them with source_format gives the
+    same pseudo codes where the format can represent them."""
+    if source_format == Format.UNICODE:
+        return list(strings)
+    table = _reverse_table(source_format)
+    return ["".join(chr(table.get(code, code)) for code in from_unicode(s)) for s in strings]
@@ -1,5 +1,7 @@
 from umschriftpy import *
+import array
 import sqlite3
+import pytest
 
 
 def test_sort():
@@ -234,3 +236,433 @@ def test_export_diaeresis():
     assert c == "ꞽmy ꞼMY"
     assert d == "jmjj JMJj"
     assert e == "jmï JMÏ"
+
+
+def test_codec():
+    """Tests the cached import codecs against strings needing the stateful import logic."""
+    assert get_codec(Format.UNICODE) is get_codec(Format.UNICODE, 0)
+    assert get_codec(Format.UNICODE) is not get_codec(
+        Format.UNICODE, UmImport.S_FOR_Z)
+    assert from_unicode("H̱i̯jjj Jj") == UmschString(
+        [0xF12C, 0xF10B, 0xF103, 0xF107, 32, 0xF106])
+    assert from_unicode("") == UmschString()
+
+
+def test_from_many():
+    """Tests batch imports into packed columns."""
+    strings = ["nfr-Htp", "aA-ptH", "", "DHw.tj-nfr"]
+    column = from_many(strings, Format.TRANSLITERATION)
+    assert len(column) == 4
+    assert list(column) == [from_transliteration(s) if s else UmschString()
+                            for s in strings]
+    assert column[-1] == from_transliteration("DHw.tj-nfr")
+    assert list(column[1:3]) == [from_transliteration("aA-ptH"), UmschString()]
+    stateful = ["H̱i̯", "jj", "ṯ"]
+    assert list(from_many(stateful)) == [from_unicode(s) for s in stateful]
+
+
+def test_export_many():
+    """Tests batch exports of lists and packed columns."""
+    strings = ["Imny Y", "qnbt", "", "sSzZ"]
+    items = [from_unicode(s) if s else UmschString() for s in strings]
+    column = from_many(strings)
+    for flags in (0, UmExport.JJ_FOR_DOUBLE_YOD | UmExport.K_WITH_DOT, UmExport.Z_FOR_S_AND_S_FOR_S_ACUTE):
+        expected = [item.to_unicode(flags) for item in items]
+        assert to_unicode_many(items, flags) == expected
+        assert to_unicode_many(column, flags) == expected
+        assert to_transliteration_many(column, flags) == [
+            item.to_transliteration(flags) for item in items]
+    assert to_pseudo_many(column) == [item.to_pseudo() for item in items]
+
+
+def test_filter_facultative():
+    """Tests the removal of facultative signs combined with other filters."""
+    a = from_unicode("ḥtp-(dꞽ) nꞽswt (m")
+    assert a.filter(UmFilter.FACULTATIVE | UmFilter.HYPHENS) == from_unicode(
+        "ḥtp  nꞽswt ")
+    assert a.filter(UmFilter.CLEAN | UmFilter.LOWER) == from_unicode(
+        "ḥtp-dꞽ nꞽswt m")
+
+
+def test_find_all_overlapping():
+    """Tests overlapping and non-overlapping searches and replacements."""
+    a = from_unicode("nnnḥtp nn")
+    b = from_unicode("nn")
+    assert a.find_all(b) == [0, 7]
+    assert a.find_all(b, overlapping=True) == [0, 1, 7]
+    assert a.find(b, 1) == 1
+    assert a.index(from_unicode("ḥtp")) == 3
+    assert a.replace(b, from_unicode("ꜣ")) == from_unicode("ꜣnḥtp ꜣ")
+    assert a.replace(b, from_unicode("ꜣ"), 1) == from_unicode("ꜣnḥtp nn")
+
+
+def test_case_mapping():
+    """Tests case mapping of strings and packed columns."""
+    a = from_unicode("Ḥtp-nṮr ʾ 𓇯")
+    assert a.upper() == from_unicode("ḤTP-NṮR ʾ 𓇯")
+    assert a.lower() == from_unicode("ḥtp-nṯr ʾ 𓇯")
+    column = from_many(["Ḥtp-nṮr", "", "nb"])
+    assert list(column.upper()) == [item.upper() for item in column]
+    assert list(column.lower()) == [item.lower() for item in column]
+
+
+def test_convert_lines():
+    """Tests that streaming conversion does not depend on the chunk size."""
+    import io
+    from umschriftpy.convert import convert_lines, convert_rows
+    text = "H̱nmw-ḥtp jjj ꞽi̯ Jj (m) h̭\nṯꜣ-ꞽꞽ\n\nnb tꜣ"
+    expected = "\n".join(from_unicode(line).filter(UmFilter.LOWER).to_unicode(UmExport.J_FOR_YOD) if line else ""
+                         for line in text.split("\n"))
+    for chunk_size in (1, 2, 3, 7, 1000):
+        converted = "".join(convert_lines(io.StringIO(text), export_flags=UmExport.J_FOR_YOD,
+                                          filter_flags=UmFilter.LOWER, chunk_size=chunk_size, batch_size=2))
+        assert converted == expected
+    rows = [["1", "nfr-Htp"], ["2", "aA-ptH"]]
+    assert list(convert_rows(rows, [1], Format.TRANSLITERATION)) == [
+        ["1", "nfr-ḥtp"], ["2", "ꜥꜣ-ptḥ"]]
+
+
+def test_convert_parallel():
+    """Tests that parallel conversion returns the results in input order."""
+    from umschriftpy.parallel import convert_parallel, from_many_parallel
+    strings = ["nfr-Htp %d" % i for i in range(50)] + ["", "DHw.tj-nfr"]
+    assert convert_parallel(strings, Format.TRANSLITERATION, jobs=2, batch_size=7) == [
+        from_transliteration(s).to_unicode() if s else "" for s in strings]
+    assert from_many_parallel(strings, Format.TRANSLITERATION, jobs=2, batch_size=7) == from_many(
+        strings, Format.TRANSLITERATION)
+
+
+def test_sort_key():
+    """Tests that binary sort keys keep the ordering of pseudo strings."""
+    name_list = [from_transliteration("nfr-Htp"), from_transliteration("Nfr-Htp"), from_transliteration(
+        "aA-ptH"), from_transliteration("DHw.tj-nfr"), from_transliteration("Aw-jb"), from_unicode("nfr 𓇯"), UmschString()]
+    assert sorted(name_list, key=UmschString.sort_key) == sorted(
+        name_list, key=UmschString.to_pseudo)
+    assert [item.to_unicode() for item in sort_many(name_list[:5], UmFilter.CLEAN | UmFilter.LOWER)] == [
+        'ꜣw-ꞽb', 'ꜥꜣ-ptḥ', 'Nfr-ḥtp', 'nfr-ḥtp', 'ḏḥw.tꞽ-nfr']
+    assert sort_many(UmColumn.from_umsch_strings(name_list)) == sorted(name_list)
+
+
+def test_sqlite_functions():
+    """Tests the SQLite collation and scalar functions."""
+    from umschriftpy.sqlite import register
+    sconn = register(sqlite3.connect(":memory:"))
+    scur = sconn.cursor()
+    scur.execute("CREATE TABLE test(name TEXT, pseudo TEXT)")
+    names = ["nfr-Htp", "aA-ptH", "DHw.tj-nfr", "Aw-jb", "Nfr-Htp"]
+    scur.executemany("INSERT INTO test VALUES(?, umsch_import(?, 'transliteration'))",
+                     [(n, n) for n in names])
+    scur.execute(
+        "CREATE INDEX test_key ON test(umsch_key(name, 'transliteration', 'CLEAN,LOWER'))")
+    scur.execute(
+        "SELECT umsch_to_unicode(pseudo) FROM test ORDER BY pseudo COLLATE UMSCHRIFT")
+    assert [r[0] for r in scur.fetchall()] == [
+        'ꜣw-ꞽb', 'ꜥꜣ-ptḥ', 'Nfr-ḥtp', 'nfr-ḥtp', 'ḏḥw.tꞽ-nfr']
+    scur.execute("SELECT umsch_to_unicode(umsch_key(name, 'transliteration', 'CLEAN,LOWER')), count(*) FROM test "
+                 "GROUP BY umsch_key(name, 'transliteration', 'CLEAN,LOWER') ORDER BY umsch_key(name, 'transliteration', 'CLEAN,LOWER')")
+    assert scur.fetchall() == [('ꜣw-ꞽb', 1), ('ꜥꜣ-ptḥ', 1),
+                               ('nfr-ḥtp', 2), ('ḏḥwtꞽ-nfr', 1)]
+    scur.execute(
+        "SELECT umsch_to_unicode(umsch_filter(pseudo, 'HYPHENS'), 'pseudo', 'K_WITH_DOT'), umsch_to_transliteration(pseudo) FROM test LIMIT 1")
+    assert scur.fetchone() == ('nfr ḥtp', 'nfr-Htp')
+
+
+def test_link():
+    """Tests linking records from databases using different formats."""
+    from umschriftpy.linkage import MatchLevel, link
+    left = [(1, "ḥꜣ.tꞽ-ꜥ"), (2, "ꞽmꞽ-rꜣ pr"), (3, "sꜣ-ptḥ")]
+    right = [("a", "HA.tj-a"), ("b", "HA.ti a"), ("c", "imi-rA pr"), ("d", "zA-ptH"), ("e", "nfr")]
+    expected = [(left[0], right[0], MatchLevel.EXACT), (left[0], right[1], MatchLevel.CLEANED),
+                (left[1], right[2], MatchLevel.EXACT), (left[2], right[3], MatchLevel.VARIANTS)]
+    for partitions in (1, 3):
+        matches = link(left, right, Format.UNICODE, Format.TRANSLITERATION, lambda r: r[1], lambda r: r[1],
+                       partitions=partitions)
+        assert sorted(tuple(m) for m in matches) == expected
+    assert [tuple(m) for m in link(left, right, Format.UNICODE, Format.TRANSLITERATION, lambda r: r[1], lambda r: r[1],
+                                   max_level=MatchLevel.EXACT)] == [expected[0], expected[2]]
+
+
+def test_fuzzy_index():
+    """Tests the weighted edit distance and the BK-tree against a linear scan."""
+    from umschriftpy.fuzzy import FuzzyIndex, distance
+    assert distance(from_unicode("sꜣ-ptḥ"), from_unicode("zꜥ.ptḥ")) == 0.7
+    assert distance(from_unicode("Ꞽmny"), from_unicode("ꞽmnï")) == 0.3
+    assert distance(from_unicode("nfr"), from_unicode("ḥtp-nṯr"), max_distance=2) == float("inf")
+    names = ["ꞽmn-ḥtp", "Ꞽmn-ḥtp", "ꞽmn-m-ḥꜣ.t", "zꜣ-ptḥ", "sꜣ-ptḥ", "ꞽnpw-ḥtp", "ptḥ-ḥtp", "ḥtp", "nfr-ḥtp", "ꜥnḫ-sn"]
+    items = [from_unicode(n) for n in names]
+    index = FuzzyIndex(items)
+    assert len(index) == len(items)
+    query = from_unicode("Ꞽmn-ḥtp.w")
+    scan = sorted((distance(query, item), item.to_unicode()) for item in items)
+    assert sorted((d, item.to_unicode()) for d, item in index.search(query, 2.5)) == [
+        pair for pair in scan if pair[0] <= 2.5]
+    assert [d for d, _ in index.top(query, 3)] == [d for d, _ in scan[:3]]
+    assert index.top(from_unicode("ꜣnḫ-sn"), 1)[0][1] == items[-1]
+
+
+def test_prefix_index():
+    """Tests autocompletion, incremental updates and serialisation of the prefix index."""
+    from umschriftpy.prefix import PrefixIndex
+    names = ["ꞽmꞽ-rꜣ pr wr", "Ꞽmn-ḥtp", "ꞽmn-ḥtp", "ꞽmn-m-ḥꜣ.t", "[ꞽ]mn-ms", "ptḥ-ḥtp", "ḥtp"]
+    index = PrefixIndex(from_unicode(n) for n in names)
+    query = from_transliteration("imn")
+    assert [s.to_unicode() for s in index.complete(query)] == ["ꞽmn-m-ḥꜣ.t", "[ꞽ]mn-ms", "Ꞽmn-ḥtp"]
+    assert [s.to_unicode() for s in index.complete(from_unicode("ꞽmn-ḥ"), unique=False)] == ["Ꞽmn-ḥtp", "ꞽmn-ḥtp"]
+    assert index.count(query) == 4
+    index.remove(from_unicode("Ꞽmn-ḥtp"))
+    index.add(from_unicode("ꞽmn-nḫt"))
+    assert from_unicode("ꞽmn-nḫt") in index and from_unicode("Ꞽmn-ḥtp") not in index
+    with pytest.raises(ValueError):
+        index.remove(from_unicode("nfr"))
+    restored = PrefixIndex.from_bytes(index.to_bytes())
+    assert restored.filter_flags == index.filter_flags
+    assert restored.complete(from_unicode("ꞽm"), 100, False) == index.complete(from_unicode("ꞽm"), 100, False)
+    assert [s.to_unicode() for s in restored.complete(from_unicode("ꞽmn-"))] == ["ꞽmn-m-ḥꜣ.t", "[ꞽ]mn-ms", "ꞽmn-nḫt", "ꞽmn-ḥtp"]
+
+
+def test_frozen():
+    """Tests hashing, comparison and interning of FrozenUmschString objects."""
+    name = from_transliteration("nfr-Htp")
+    frozen = name.freeze()
+    assert frozen == name and name == frozen and frozen.thaw() == name
+    assert frozen == FrozenUmschString("nfr-Htp", Format.TRANSLITERATION) == FrozenUmschString(name)
+    assert len({frozen, FrozenUmschString("nfr-ḥtp"), FrozenUmschString("Nfr-ḥtp")}) == 2
+    assert {frozen: 1}[from_unicode("nfr-ḥtp").freeze()] == 1
+    assert sorted([FrozenUmschString("ptḥ"), frozen, FrozenUmschString("ꜥꜣ")]) == [
+        FrozenUmschString("ꜥꜣ"), FrozenUmschString("ptḥ"), frozen]
+    assert frozen.key(UmFilter.HYPHENS | UmFilter.LOWER) == from_unicode("nfr ḥtp").to_pseudo()
+    assert frozen.filter(UmFilter.HYPHENS).to_unicode() == "nfr ḥtp"
+    assert frozen[0:3] == from_unicode("nfr") and frozen[0] == name[0] and list(frozen) == list(name)
+    titles = freeze_many(["sš nsw", "ḥm-nṯr", "sš nsw"])
+    assert titles[0] is titles[2] and titles[0] is from_unicode("sš nsw").freeze(intern=True)
+    assert titles[1].to_unicode() == "ḥm-nṯr" and titles[1].to_transliteration() == from_unicode("ḥm-nṯr").to_transliteration()
+
+
+def test_buffers():
+    """Tests fixed-width storage and conversion from and to buffers."""
+    name = from_unicode("ḥtp-dꞽ-nsw.t 𓊵")
+    assert name.itemsize == 4 and bytes(memoryview(name)) == name.to_utf32()
+    assert from_buffer(name.to_utf32()) == name and from_buffer(memoryview(name)) == name
+    assert from_buffer(array.array('L', name)) == name and from_buffer(array.array('I', name)) == name
+    assert from_pseudo(name.to_pseudo()) == name
+    column = from_many(["ꞽmn-ḥtp", "", "ḥm-nṯr"])
+    assert UmColumn.from_buffers(column.data.to_utf32(), column.offsets) == column
+
+
+def test_compact():
+    """Tests that compact strings of all widths behave like UmschString objects."""
+    from umschriftpy.compact import CompactColumn
+    names = ["Ḥtp-ꞽ(w)⸗f", "ä ḥtp", "nfr 𓊵", ""]
+    for name, width in zip(names, (1, 2, 4, 1)):
+        umsch = from_unicode(name)
+        compact = umsch.compact()
+        assert compact.width == width and compact.nbytes == width * len(umsch)
+        assert compact == umsch and compact.thaw() == umsch and list(compact) == list(umsch)
+        assert compact.upper() == umsch.upper() and compact.lower() == umsch.lower()
+        assert compact.filter(UmFilter.CLEAN | UmFilter.LOWER) == umsch.filter(UmFilter.CLEAN | UmFilter.LOWER)
+        assert compact.to_unicode() == name and compact.to_transliteration() == umsch.to_transliteration()
+        assert compact.find_all(from_unicode("ḥ")) == umsch.find_all(from_unicode("ḥ"))
+    compacts = [from_unicode(name).compact() for name in names]
+    assert sorted(compacts) == [c.compact() for c in sorted(from_unicode(name) for name in names)]
+    column = CompactColumn.from_strings(names)
+    assert list(column) == compacts and column[1] == compacts[1] and column.to_pseudo_list() == to_pseudo_many(
+        [from_unicode(name) for name in names])
+
+
+def test_corpus(tmp_path):
+    """Tests writing a corpus file and querying the memory-mapped corpus."""
+    from umschriftpy.corpus import Corpus, write_corpus
+    names = ["ptḥ-ḥtp", "Ḥm-kꜣ", "ꜥnḫ-ptḥ", "[ḥm]-kꜣ", "nfr-ḥtp"]
+    path = tmp_path / "names.umc"
+    assert write_corpus(path, [from_unicode(n).to_transliteration() for n in names], Format.TRANSLITERATION,
+                        key_flags=UmFilter.CLEAN | UmFilter.LOWER) == len(names)
+    with Corpus(path) as corpus:
+        assert len(corpus) == len(names) and list(corpus) == [from_unicode(n) for n in names]
+        assert corpus.pseudo(-1) == from_unicode("nfr-ḥtp").to_pseudo() and corpus.to_unicode(2) == "ꜥnḫ-ptḥ"
+        assert corpus.key(3) == from_unicode("ḥm-kꜣ").to_pseudo()
+        assert corpus.find_all(from_unicode("ptḥ")) == [(0, 0), (2, 4)]
+        assert corpus.lookup(from_unicode("ḥm-kꜣ")) == [3, 1]
+        assert [corpus.to_unicode(row) for row in corpus.sorted_rows()] == [
+            "ꜥnḫ-ptḥ", "ptḥ-ḥtp", "nfr-ḥtp", "[ḥm]-kꜣ", "Ḥm-kꜣ"]
+        assert corpus.to_column() == from_many(names)
+
+
+def test_ngram_index():
+    """Tests corpus search across formats and editorial marks with spans in the original texts."""
+    from umschriftpy.ngram import NgramIndex
+    texts = [from_unicode("ḥtp-dꞽ-nsw.t ꞽnpw"), from_trlit_cg_times("Htp-di-[nsw]t Wsir"),
+             from_transliteration("Htp-di-nswt"), from_unicode("nfr-ḥtp"), from_unicode("sš")]
+    index = NgramIndex(texts)
+    query = from_unicode("ḥtp-dꞽ-nswt")
+    results = index.search(query)
+    assert [doc_id for doc_id, _ in results] == [0, 1, 2]
+    assert [texts[doc_id][start:end].to_unicode() for doc_id, spans in results for start, end in spans] == [
+        "ḥtp-dꞽ-nsw.t", "ḥtp-dꞽ-[nsw]t", "ḥtp-dꞽ-nswt"]
+    assert index.search(from_unicode("sš")) == [(4, [(0, 2)])]
+    index.remove(1)
+    assert [doc_id for doc_id, _ in index.search(query)] == [0, 2] and len(index) == 4
+    index.compact()
+    assert index.add(from_unicode("ḥtp-dꞽ nswt")) == 5
+    restored = NgramIndex.from_bytes(index.to_bytes())
+    assert restored.search(query) == index.search(query) and len(restored) == 5
+    assert restored.document(5) == from_unicode("ḥtp-dꞽ nswt") and restored.document(1) is None
+
+
+def test_detect_format():
+    """Tests the detection of the source format of columns."""
+    from umschriftpy.detect import detect_format, from_many_detected
+    names = ["ḥtp-dꞽ-nsw.t", "ꞽmꞽ-rꜣ pr wr", "ꜥnḫ-ḥr", "sꜣ-ptḥ"]
+    results = detect_format(names)
+    assert results[0][0] == Format.UNICODE and results[0][1] > 0.99
+    assert abs(sum(confidence for _, confidence in results) - 1) < 1e-9
+    ttn = ["Htp-dj-nsw.t", "jmj-r# pr wr", "onX-Hr", "s#-ptH"]
+    column, source_format = from_many_detected(iter(ttn))
+    assert source_format == Format.UMSCHRIFT_TTN and column.to_pseudo_list() == to_pseudo_many(from_unicode(n) for n in names)
+    column, source_format = from_many_detected(["Htp-di-nsw.t", "imi-rA pr wr", "anx-Hr", "zA-ptH"])
+    assert source_format == Format.TRANSLITERATION and column[3].to_unicode() == "zꜣ-ptḥ"
+    # a combining mark the import cannot decode (x with macron below) does not abort the detection
+    assert detect_format(["x\u0331"])[0][0] == Format.UNICODE
+    assert detect_format(names + ["x\u0331"])[0][0] == Format.UNICODE
+    assert detect_format(["x\u0331\u0331"])[0][0] == Format.UNICODE  # stacked marks
+    assert detect_format(["\u1e25tp x\u0331\u0331 nsw", "\u1e25\u0331\u0331"])[0][0] == Format.UNICODE
+
+
+def test_instrumentation():
+    """Tests the conversion counters, unmapped character statistics and hooks."""
+    import threading
+    import umschriftpy.umschriftpy
+    from umschriftpy.instrument import enabled, instrumented, add_hook, remove_hook
+    original = UmCodec.translate
+    calls = []
+    hook = lambda *args: calls.append(args)
+    add_hook(hook)
+    try:
+        with instrumented() as stats:
+            assert umschriftpy.umschriftpy._probe is not None
+            text = from_unicode("ḥtp ä")
+            assert text.to_unicode() == "ḥtp ä"
+            to_unicode_many(from_many(["h\u0331", "nfr"]))
+            to_unicode_many(row for row in [text])
+            assert text.freeze().to_unicode() == "ḥtp ä"
+            from_transliteration("Htp")
+            text.filter(UmFilter.CLEAN)
+            assert text.find(from_unicode("tp")) == 1
+        assert not enabled()
+    finally:
+        remove_hook(hook)
+    assert UmCodec.translate is original and umschriftpy.umschriftpy._probe is None
+    assert stats.calls["import", "UNICODE"] == 3 and stats.chars["import", "UNICODE"] == 12
+    assert stats.calls["import", "TRANSLITERATION"] == 1
+    assert stats.calls["export", "UNICODE"] == 4 and stats.chars["export", "UNICODE"] == 19
+    assert stats.calls["filter", "CLEAN"] == 1 and stats.calls["search", "UmschString"] == 1
+    assert stats.combining["UNICODE"] == 1
+    assert stats.unmapped["import", "UNICODE"] == {"ä": 1}
+    assert len(calls) == 10 and calls[0][:3] == ("import", "UNICODE", 5)
+    assert "unmapped in import (UNICODE): U+00E4" in stats.report()
+    # nested blocks collect separately, conversions of other threads only with all_threads
+    with instrumented() as outer:
+        with instrumented() as inner:
+            from_unicode("nfr")
+        from_unicode("ḥtp")
+        thread = threading.Thread(target=from_unicode, args=("ꜥnḫ",))
+        thread.start()
+        thread.join()
+        with instrumented(all_threads=True) as threads:
+            thread = threading.Thread(target=from_unicode, args=("ꜥnḫ",))
+            thread.start()
+            thread.join()
+        assert enabled()
+    assert not enabled() and umschriftpy.umschriftpy._probe is None
+    assert inner.calls["import", "UNICODE"] == 1 and outer.calls["import", "UNICODE"] == 2
+    assert threads.calls["import", "UNICODE"] == 1
+
+
+def test_async_service():
+    """Tests the asyncio conversion API: micro-batching, coalescing, streaming and the line server."""
+    import asyncio
+    import gc
+    from umschriftpy.aio import ConversionService, aconvert, aconvert_many
+
+    async def main():
+        service = ConversionService(max_concurrency=2, batch_size=3)
+        batches = []
+        original = service._execute
+
+        async def execute(function, strings, options):
+            batches.append(list(strings))
+            return await original(function, strings, options)
+        service._execute = execute
+        results = await asyncio.gather(*(service.convert(text, source_format=Format.TRANSLITERATION)
+                                         for text in ["Htp", "nfr", "Htp", "DHwtj"]))
+        assert results == ["ḥtp", "nfr", "ḥtp", "ḏḥwtꞽ"]
+        assert batches == [["Htp", "nfr", "DHwtj"]]  # one micro-batch, the repeated string is converted once
+        # queued micro-batches are kept alive by the service, not only by the loop
+        waiter = asyncio.ensure_future(service.convert("nfr"))
+        await asyncio.sleep(0)
+        gc.collect()
+        assert await waiter == "nfr" and not service._tasks
+
+        async def source():
+            for text in ["Htp", "nfr", "sA", "anx"]:
+                yield text
+        assert [result async for result in service.iter_convert(source(), source_format=Format.TRANSLITERATION)] == [
+            "ḥtp", "nfr", "sꜣ", "ꜥnḫ"]
+        assert await aconvert("Htp", source_format=Format.TRANSLITERATION, output_format=None) == from_transliteration("Htp").to_pseudo()
+        assert await aconvert_many(["ḥtp", "ẖ"], output_format=Format.TRANSLITERATION) == ["Htp", "X"]
+
+        server = await service.start_server(source_format=Format.TRANSLITERATION)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(b"Htp-di-nswt\nsA-ptH\n")
+            await writer.drain()
+            assert await reader.readline() == "ḥtp-dꞽ-nswt\n".encode()
+            assert await reader.readline() == "sꜣ-ptḥ\n".encode()
+            writer.close()
+    asyncio.run(main())
+
+
+def test_sign_pattern(tmp_path):
+    """Tests sign-class patterns on strings, columns and corpus files."""
+    from umschriftpy.pattern import SignPattern, compile_pattern
+    from umschriftpy.corpus import Corpus, write_corpus
+    text = from_unicode("sḏm⸗f sḏm⸗sn sḏm.n⸗k")
+    assert [text[start:end].to_unicode() for start, end in SignPattern("sḏm⸗{suffix}").find_all(text)] == ["sḏm⸗f", "sḏm⸗sn"]
+    assert [text[start:end].to_unicode() for start, end in SignPattern("sḏm(.n)?⸗[fk]").find_all(text)] == ["sḏm⸗f", "sḏm.n⸗k"]
+    assert SignPattern("{weak}+n|[ꜣꜥ]{2}").fullmatch(from_unicode("ꜣꞽn")) and not SignPattern("[^ꜣ]n").search(from_unicode("ꜣn"))
+    pattern = compile_pattern("ḥtp-dꞽ-nswt", filter_flags=UmFilter.CLEAN | UmFilter.LOWER)
+    names = [from_trlit_cg_times("Htp-di-[nsw]t Wsir"), from_unicode("nfr"), from_unicode("ḥtp-dꞽ-nsw.t")]
+    assert pattern.search_many(from_many(to_unicode_many(names))) == [(0, [(0, 13)]), (2, [(0, 12)])]
+    assert SignPattern("Htp-di-\\[nsw\\]t", Format.TRLIT_CG_TIMES).search(names[0]) == (0, 13)
+    write_corpus(tmp_path / "names.umc", names)
+    with Corpus(tmp_path / "names.umc") as corpus:
+        assert corpus.find_pattern("ḥtp-dꞽ-nsw(.)?t") == [(2, [(0, 12)])]
+    with pytest.raises(ValueError):
+        SignPattern("(nfr")
+
+
+def test_incremental_converter(monkeypatch):
+    """Tests incremental conversion under edits against converting the whole text."""
+    import umschriftpy.incremental
+    from umschriftpy.incremental import IncrementalConverter
+    converter = IncrementalConverter("Htp-dj-nsw.t", Format.UMSCHRIFT_TTN)
+    assert converter.output == "ḥtp-dꞽ-nsw.t"
+    assert converter.edit(5, 0, "j") == (5, 1, "y")  # dj becomes djj
+    assert converter.output == from_umschrift_ttn("Htp-djj-nsw.t").to_unicode()
+    converter = IncrementalConverter("h xt")
+    assert converter.edit(1, 0, "̱") == (0, 1, "ẖ") and converter.output == "ẖ xt"
+    assert converter.output_offset(2) == 1 and converter.source_offset(1) == 2
+    assert converter.edit(3, 1, "") == (2, 1, "")
+    assert converter.source == "ẖ t" and converter.output == from_unicode("ẖ t").to_unicode()
+    with pytest.raises(IndexError):
+        converter.edit(5, 1, "")
+    # edits across chunk boundaries, with tiny chunks
+    monkeypatch.setattr(umschriftpy.incremental, "_CHUNK_SIZE", 4)
+    text = "Htp-dj-nsw.t jjj Axt Hr-xnty"
+    converter = IncrementalConverter(text, Format.UMSCHRIFT_TTN)
+    for position, deleted, inserted in [(3, 1, ""), (12, 0, "J"), (0, 5, "xt"), (20, 3, "j-j"), (9, 10, "")]:
+        before = converter.output
+        output_position, output_deleted, output_inserted = converter.edit(position, deleted, inserted)
+        text = text[:position] + inserted + text[position + deleted:]
+        assert converter.source == text and converter.output == from_umschrift_ttn(text).to_unicode()
+        assert before[:output_position] + output_inserted + before[output_position + output_deleted:] == converter.output
+        assert converter.source_offset(converter.output_offset(len(text))) == len(text)
@@ -1,2 +1,12 @@
-from .umschriftpy import from_pseudo, from_transliteration, from_trlit_cg_times, from_trlit_cg_times_2023, from_umschrift_ttn, from_unicode, UmschString, UmExport, UmImport, UmFilter
-#from .constants import UmExport
\ No newline at end of file
+from .umschriftpy import freeze_many, from_buffer, from_pseudo, from_transliteration, from_trlit_cg_times, from_trlit_cg_times_2023, from_umschrift_ttn, from_unicode, get_codec, get_export_table, get_filter_table, Format, FrozenUmschString, UmCodec, UmschString, UmExport, UmImport, UmFilter
+#from .constants import UmExport
+
+_BATCH_NAMES = ("from_many", "sort_keys_many", "sort_many", "to_pseudo_many", "to_transliteration_many", "to_unicode_many", "UmColumn")
+__all__ = ["freeze_many", "from_buffer", "from_pseudo", "from_transliteration", "from_trlit_cg_times", "from_trlit_cg_times_2023", "from_umschrift_ttn", "from_unicode", "get_codec", "get_export_table", "get_filter_table", "Format", "FrozenUmschString", "UmCodec", "UmschString", "UmExport", "UmImport", "UmFilter", *_BATCH_NAMES]
+
+
+def __getattr__(name):  # the batch API is imported on first use
+    if name in _BATCH_NAMES:
+        from . import batch
+        return getattr(batch, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
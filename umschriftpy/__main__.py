@@ -0,0 +1,104 @@
+# Command-line converter: python -m umschriftpy --from trlit_cg_times --to unicode < input.txt > output.txt
+import argparse
+import csv
+import sys
+
+from .umschriftpy import Format, UmExport, UmFilter, UmImport, parse_flags
+from .convert import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, convert_lines, convert_rows
+
+OUTPUT_FORMATS = {"unicode": Format.UNICODE,
+                  "transliteration": Format.TRANSLITERATION, "pseudo": None}
+
+
+def _flags(flag_type):  # argparse type for comma-separated flag names
+    def parse(value: str):
+        try:
+            return parse_flags(flag_type, value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return parse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m umschriftpy",
+                                     description="Converts Egyptological transliteration/transcription in text, CSV and TSV files.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="input file (default: standard input)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="output file (default: standard output)")
+    parser.add_argument("-f", "--from", dest="source_format", default="unicode",
+                        choices=[f.name.lower() for f in Format if f != Format.COMMON_D])
+    parser.add_argument("-t", "--to", dest="output_format",
+                        default="unicode", choices=list(OUTPUT_FORMATS))
+    parser.add_argument("--import-flags", type=_flags(UmImport), default=UmImport(0),
+                        help="comma-separated UmImport flags, e.g. S_FOR_Z")
+    parser.add_argument("--export-flags", type=_flags(UmExport), default=UmExport(0),
+                        help="comma-separated UmExport flags, e.g. K_WITH_DOT,J_FOR_YOD")
+    parser.add_argument("--filter", dest="filter_flags", type=_flags(UmFilter), default=UmFilter(0),
+                        help="comma-separated UmFilter flags, e.g. CLEAN,LOWER")
+    parser.add_argument("-d", "--delimiter",
+                        help="convert a delimited file (use \\t for TSV) instead of whole lines")
+    parser.add_argument("-c", "--columns",
+                        help="comma-separated 1-based column numbers to convert (default: all)")
+    parser.add_argument("--header", action="store_true",
+                        help="copy the first row of a delimited file unchanged")
+    parser.add_argument("--encoding", default="utf-8")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (0: all CPUs)")
+    parser.add_argument("--stats", action="store_true",
+                        help="print conversion counters, timings and unmapped characters to standard error "
+                             "(conversions in worker processes started with --jobs are not counted)")
+    return parser
+
+
+def _open(path: str, mode: str, encoding: str):
+    if path == "-":
+        stream = sys.stdin if "r" in mode else sys.stdout
+        stream.reconfigure(encoding=encoding, newline="")
+        return stream
+    return open(path, mode, encoding=encoding, newline="")
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    options = dict(source_format=Format[args.source_format.upper()], output_format=OUTPUT_FORMATS[args.output_format],
+                   import_flags=args.import_flags, export_flags=args.export_flags, filter_flags=args.filter_flags,
+                   batch_size=args.batch_size, jobs=args.jobs or None)
+    if args.stats:
+        from . import instrument
+        stats = instrument.enable()
+    source = _open(args.input, "r", args.encoding)
+    target = _open(args.output, "w", args.encoding)
+    try:
+        if args.delimiter is None:
+            for piece in convert_lines(source, chunk_size=args.chunk_size, **options):
+                target.write(piece)
+        else:
+            delimiter = "\t" if args.delimiter in (
+                "\\t", "tab") else args.delimiter
+            columns = None if not args.columns else [
+                int(c) - 1 for c in args.columns.split(",")]
+            reader = csv.reader(source, delimiter=delimiter)
+            writer = csv.writer(
+                target, delimiter=delimiter, lineterminator="\n")
+            header = next(reader, None) if args.header else None
+            if header is not None:
+                writer.writerow(header)
+            writer.writerows(convert_rows(reader, columns, **options))
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        else:
+            target.flush()
+        if args.stats:
+            instrument.disable()
+            print(stats.report(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
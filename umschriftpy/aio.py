@@ -0,0 +1,227 @@
+# Conversion API for asyncio applications: CPU work runs in an executor, in micro-batches, with bounded concurrency
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from weakref import WeakKeyDictionary
+
+from .umschriftpy import Format
+from .convert import DEFAULT_BATCH_SIZE, convert_strings, _batches
+
+# Single conversions requested in the same event loop iteration with the same options are converted as one batch, and
+# a conversion already in flight is shared by all callers requesting it. Bulk conversions (convert_many, iter_convert)
+# may only occupy max_concurrency - reserved executor slots, so that interactive requests are not queued behind a
+# large upload.
+
+
+def _options(source_format=Format.UNICODE, output_format=Format.UNICODE, import_flags=0, export_flags=0, filter_flags=0):
+    return dict(source_format=source_format, output_format=output_format, import_flags=import_flags,
+                export_flags=export_flags, filter_flags=filter_flags)
+
+
+def _convert_isolated(strings: list, options: dict):  # converts one by one, returning exceptions instead of failed results
+    res = []
+    for string in strings:
+        try:
+            res.append(convert_strings([string], **options)[0])
+        except Exception as exc:
+            res.append(exc)
+    return res
+
+
+async def _abatches(source, batch_size: int):
+    """Yields lists of at most batch_size items of an iterable or asynchronous iterable. Items of an asynchronous
+    source are passed on as soon as it waits for more input, so a slow stream is not held back to fill a batch."""
+    if not hasattr(source, "__aiter__"):
+        for batch in _batches(source, batch_size):
+            yield batch
+        return
+    iterator = source.__aiter__()
+    batch = []
+    next_item = None
+    try:
+        while True:
+            next_item = asyncio.ensure_future(iterator.__anext__())
+            if batch and not next_item.done():
+                await asyncio.sleep(0)
+                if not next_item.done():
+                    yield batch
+                    batch = []
+            try:
+                item = await next_item
+            except StopAsyncIteration:
+                break
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+    finally:
+        if next_item is not None and not next_item.done():
+            next_item.cancel()
+
+
+class ConversionService:
+    """Converts strings (see convert.convert_strings for the options) without blocking the event loop.
+    The conversions run in executor (the default executor of the loop if None), which may be a ThreadPoolExecutor or a
+    ProcessPoolExecutor. At most max_concurrency batches are converted at once, of which reserved slots are kept free
+    for single conversions; bulk conversions are split into batches of batch_size strings.
+    A service belongs to the event loop it is created in (its semaphores and futures are bound to it), so it must be
+    created inside a running loop, e.g. in a coroutine or with default_service()."""
+
+    def __init__(self, executor=None, max_concurrency: int = 2, reserved: int = 1, batch_size: int = DEFAULT_BATCH_SIZE):
+        if not 0 <= reserved < max_concurrency:
+            raise ValueError("reserved must be smaller than max_concurrency")
+        self._loop = asyncio.get_running_loop()  # raises RuntimeError outside of a running event loop
+        self.executor = executor
+        self.batch_size = batch_size
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._bulk_slots = asyncio.Semaphore(max_concurrency - reserved)
+        self._in_flight = {}  # (string, options key) -> future shared by all callers
+        self._queued = {}  # options key -> (options, strings, futures) waiting for the next micro-batch
+        self._tasks = set()  # the loop only keeps weak references to tasks, so running ones are kept here
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _execute(self, function, strings: list, options: dict):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            if isinstance(self.executor, ProcessPoolExecutor):
+                from .parallel import _convert_batch, _unpack_strings
+                if function is convert_strings:
+                    return _unpack_strings(await loop.run_in_executor(self.executor, _convert_batch, strings, options))
+                return await loop.run_in_executor(self.executor, function, strings, options)
+            if function is convert_strings:
+                return await loop.run_in_executor(self.executor, partial(convert_strings, strings, **options))
+            return await loop.run_in_executor(self.executor, function, strings, options)
+
+    async def _bulk(self, strings: list, options: dict):
+        async with self._bulk_slots:
+            return await self._execute(convert_strings, strings, options)
+
+    async def convert(self, string: str, **options):
+        """Converts one string. Identical concurrent requests share one conversion."""
+        options = _options(**options)
+        options_key = tuple(options.values())
+        future = self._in_flight.get((string, options_key))
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._in_flight[string, options_key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop((string, options_key), None))
+            queued = self._queued.get(options_key)
+            if queued is None:
+                queued = self._queued[options_key] = (options, [], [])
+                asyncio.get_running_loop().call_soon(self._flush, options_key)
+            queued[1].append(string)
+            queued[2].append(future)
+            if len(queued[1]) >= self.batch_size:
+                self._flush(options_key)
+        return await asyncio.shield(future)
+
+    def _flush(self, options_key):
+        queued = self._queued.pop(options_key, None)
+        if queued is not None:
+            self._spawn(self._run_queued(*queued))
+
+    async def _run_queued(self, options: dict, strings: list, futures: list):
+        try:
+            results = await self._execute(convert_strings, strings, options)
+        except Exception as exc:
+            if len(strings) == 1:
+                results = [exc]
+            else:  # a failing string must not fail the other requests of the batch
+                try:
+                    results = await self._execute(_convert_isolated, strings, options)
+                except Exception as exc:
+                    results = [exc] * len(strings)
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def convert_many(self, strings, **options):
+        """Converts an iterable of strings in batches and returns the list of results."""
+        res = []
+        async for result in self.iter_convert(strings, **options):
+            res.append(result)
+        return res
+
+    async def iter_convert(self, source, **options):
+        """Converts an iterable or asynchronous iterable of strings, yielding the results in input order. Besides the
+        batch whose results are being yielded, at most two batches are read ahead and converting (one queued, one
+        waiting to be queued), so the source is consumed at the pace of the consumer."""
+        options = _options(**options)
+        # conversion tasks of the batches read ahead (an exception of the source, None at its end); the reader blocks
+        # on put with the next task while the queue is full
+        ready = asyncio.Queue(1)
+
+        async def read():
+            try:
+                async for batch in _abatches(source, self.batch_size):
+                    await ready.put(self._spawn(self._bulk(batch, options)))
+            except Exception as exc:
+                await ready.put(exc)
+                return
+            await ready.put(None)
+        reader = self._spawn(read())
+        try:
+            while True:
+                task = await ready.get()
+                if task is None:
+                    break
+                if isinstance(task, Exception):
+                    raise task
+                for result in await task:
+                    yield result
+        finally:
+            reader.cancel()
+            while not ready.empty():
+                task = ready.get_nowait()
+                if isinstance(task, asyncio.Future):
+                    task.cancel()
+
+    async def start_server(self, host: str = "127.0.0.1", port: int = 0, encoding: str = "utf-8", **options):
+        """Starts a line-based TCP server answering every line it receives with its conversion, e.g. as a local
+        stand-in for a conversion service in tests. Returns the asyncio.Server (port 0 picks a free port)."""
+        async def handle(reader, writer):
+            async def lines():
+                async for line in reader:
+                    yield line.decode(encoding).rstrip("\r\n")
+            try:
+                async for result in self.iter_convert(lines(), **options):
+                    writer.write(result.encode(encoding) + b"\n")
+                    await writer.drain()
+            finally:
+                writer.close()
+        return await asyncio.start_server(handle, host, port)
+
+
+_services = WeakKeyDictionary()  # event loop -> default ConversionService
+
+
+def default_service():  # returns the default ConversionService of the running event loop
+    loop = asyncio.get_running_loop()
+    service = _services.get(loop)
+    if service is None:
+        service = _services[loop] = ConversionService()
+    return service
+
+
+async def aconvert(string: str, **options):
+    """Converts one string with the default service, e.g. await aconvert("Htp", source_format=Format.TRANSLITERATION)."""
+    return await default_service().convert(string, **options)
+
+
+async def aconvert_many(strings, **options):
+    return await default_service().convert_many(strings, **options)
+
+
+def aiter_convert(source, **options):  # async for result in aiter_convert(source, ...)
+    return default_service().iter_convert(source, **options)
@@ -0,0 +1,133 @@
+# Batch conversion of many strings into packed columns
+import array
+from itertools import accumulate
+
+from . import umschriftpy as core
+from .umschriftpy import Format, UmschString, from_buffer, from_pseudo, get_codec, get_export_table, pseudo_sort_key, _decode
+
+
+class UmColumn:
+    """Packed column of transliteration strings (Arrow-style): all pseudo codes are stored in one
+    contiguous buffer, row i occupies data[offsets[i]:offsets[i + 1]]."""
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, data=None, offsets=None):
+        self.data = data if data is not None else UmschString()
+        self.offsets = offsets if offsets is not None else array.array('L', [
+                                                                       0])
+
+    @classmethod
+    def from_umsch_strings(cls, items):  # packs existing UmschString objects into a column
+        data = UmschString()
+        offsets = array.array('L', [0])
+        for item in items:
+            data.extend(item)
+            offsets.append(len(data))
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, key):  # rows are returned as UmschString objects, slices as columns
+        if type(key) == slice:
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return UmColumn.from_umsch_strings(self[i] for i in range(start, stop, step))
+            stop = max(start, stop)
+            base = self.offsets[start]
+            return UmColumn(self.data[base:self.offsets[stop]], array.array('L', (offset - base for offset in self.offsets[start:stop + 1])))
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("column index out of range")
+        return self.data[self.offsets[key]:self.offsets[key + 1]]
+
+    @classmethod
+    def from_buffers(cls, data, offsets):
+        """Builds a column from a buffer of 32-bit pseudo codes (see from_buffer) and a sequence of row offsets."""
+        return cls(from_buffer(data), array.array('L', offsets))
+
+    def to_numpy(self):
+        """Returns NumPy arrays (data, offsets) sharing the buffers of the column, so that operations such as case
+        folding or filtering masks can be vectorised over all rows (requires NumPy)."""
+        import numpy
+        return self.data.to_numpy(), numpy.frombuffer(self.offsets, dtype="u%d" % self.offsets.itemsize)
+
+    def to_pseudo_list(self):  # decodes the whole buffer once and splits it into pseudo strings
+        pseudo = _decode(self.data)
+        offsets = self.offsets
+        return [pseudo[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+    def upper(self):  # case mapping keeps the row lengths, so the offsets are reused
+        return UmColumn(self.data.upper(), array.array('L', self.offsets))
+
+    def lower(self):
+        return UmColumn(self.data.lower(), array.array('L', self.offsets))
+
+    def __iter__(self):
+        data = self.data
+        offsets = self.offsets
+        for i in range(len(offsets) - 1):
+            yield data[offsets[i]:offsets[i + 1]]
+
+    def __eq__(self, other):
+        if not isinstance(other, UmColumn):
+            return NotImplemented
+        return self.offsets == other.offsets and self.data == other.data
+
+    def __repr__(self):
+        return "UmColumn(%d rows)" % len(self)
+
+
+def from_many(strings, source_format: Format = Format.UNICODE, flags=0):
+    """Imports an iterable of strings into an UmColumn using one pass through the import tables."""
+    converted, lengths = get_codec(
+        source_format, flags).translate_many(list(strings))
+    offsets = array.array('L', [0])
+    offsets.extend(accumulate(lengths))
+    return UmColumn(from_pseudo(converted), offsets)
+
+
+def _to_column(items):
+    return items if isinstance(items, UmColumn) else UmColumn.from_umsch_strings(items)
+
+
+def _export_rows(rows: list, output_format: Format, flags=0, discard_not_found: bool = False):  # exports pseudo strings
+    if core._probe is not None:
+        res = core._probe(_export_rows, rows, output_format, flags, discard_not_found)
+        if res is not core._UNMEASURED:
+            return res
+    table = get_export_table(output_format, flags, discard_not_found)
+    return [row.translate(table) for row in rows]
+
+
+def _export_many(items, output_format: Format, flags=0, discard_not_found: bool = False):
+    return _export_rows(_to_column(items).to_pseudo_list(), output_format, flags, discard_not_found)
+
+
+def to_pseudo_many(items):
+    """Exports a list of UmschString objects or an UmColumn as pseudo strings."""
+    return _to_column(items).to_pseudo_list()
+
+
+def to_unicode_many(items, flags=0):
+    """Exports a list of UmschString objects or an UmColumn as Unicode strings using the UmExport flags."""
+    return _export_many(items, Format.UNICODE, flags)
+
+
+def to_transliteration_many(items, flags=0):
+    """Exports a list of UmschString objects or an UmColumn as strings for the Transliteration font using the UmExport flags."""
+    return _export_many(items, Format.TRANSLITERATION, flags, True)
+
+
+def sort_keys_many(items, flags=0):
+    """Returns the UmschString.sort_key of every item of a list of UmschString objects or an UmColumn."""
+    return [pseudo_sort_key(pseudo, flags) for pseudo in to_pseudo_many(items)]
+
+
+def sort_many(items, filter_flags=0, reverse: bool = False):
+    """Sorts a list of UmschString objects or the rows of an UmColumn by their sort keys (see UmschString.sort_key)
+    and returns them as a list."""
+    keys = sort_keys_many(items, filter_flags)
+    order = sorted(range(len(keys)), key=keys.__getitem__, reverse=reverse)
+    return [items[i] for i in order]
@@ -0,0 +1,254 @@
+# Compact storage of pseudo codes with 1, 2 or 4 bytes per character (similar to PEP 393 strings)
+import array
+import codecs
+from operator import ge, gt, le, lt
+from sys import byteorder
+
+from .umschriftpy import Format, LOWER_TABLE, PSEUDO_CAPITAL_ALEPH, PSEUDO_DOT, PSEUDO_RIGHT_ANGLE_BRACKET, \
+    PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_d_WITH_LINE, UPPER_TABLE, filter_pseudo, \
+    export_pseudo, from_pseudo, get_codec, pseudo_sort_key, _decode
+
+# One-byte strings hold ASCII as is and the pseudo codes as 0x80-0xCB, so that almost all transliteration fits into
+# one byte per character. The mapping keeps the order of the codes.
+_ONE_BYTE_CODES = [*range(PSEUDO_DOT, PSEUDO_SUFFIX_PRONOMEN_SEPARATOR + 1),
+                   *range(PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_RIGHT_ANGLE_BRACKET + 1),
+                   *range(PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1)]
+_DECODING_TABLE = "".join(map(chr, [*range(0x80), *_ONE_BYTE_CODES])).ljust(0x100, "\ufffe")  # U+FFFE: undefined
+_ENCODING_MAP = codecs.charmap_build(_DECODING_TABLE)
+_UTF_16 = "utf_16_le" if byteorder == "little" else "utf_16_be"
+_UTF_32 = "utf_32_le" if byteorder == "little" else "utf_32_be"
+_TYPECODES = {2: 'H', 4: 'I'}
+
+
+def _byte_table(table: dict):  # bytes.translate table for a case mapping of one-byte strings
+    return bytes(_DECODING_TABLE.index(chr(table[ord(char)])) if ord(char) in table else i
+                 for i, char in enumerate(_DECODING_TABLE))
+
+
+_UPPER_BYTES = _byte_table(UPPER_TABLE)
+_LOWER_BYTES = _byte_table(LOWER_TABLE)
+
+
+def _encode(pseudo: str):  # returns (width, data) with the smallest width able to hold the pseudo string
+    try:
+        return 1, codecs.charmap_encode(pseudo, "strict", _ENCODING_MAP)[0]
+    except UnicodeEncodeError:
+        pass
+    try:
+        data = pseudo.encode(_UTF_16)  # fails on surrogates
+        if len(data) == 2 * len(pseudo):  # no characters outside the BMP
+            return 2, data
+    except UnicodeEncodeError:
+        pass
+    return 4, pseudo.encode(_UTF_32, "surrogatepass")
+
+
+def _decode_compact(width: int, data: bytes):
+    if width == 1:
+        return codecs.charmap_decode(data, "strict", _DECODING_TABLE)[0]
+    if width == 2:
+        return data.decode(_UTF_16)
+    return data.decode(_UTF_32, "surrogatepass")
+
+
+def _pseudo(value):  # accepts CompactUmschString and UmschString objects (or other code point arrays) and pseudo strings
+    if isinstance(value, CompactUmschString):
+        return value.to_pseudo()
+    return _decode(value) if isinstance(value, array.array) else value
+
+
+class CompactUmschString:
+    """Immutable UmschString counterpart storing its pseudo codes with 1, 2 or 4 bytes per character, whichever is the
+    smallest that can hold all of them. Plain transliteration needs one byte per character, Unicode characters without
+    a pseudo code two bytes and hieroglyphs four bytes. Equal values always have the same width and bytes, so
+    comparison and hashing work on the bytes directly."""
+    __slots__ = ("_width", "_data")
+
+    def __new__(cls, initializer=(), source_format: Format = Format.UNICODE, flags=0):
+        if type(initializer) == str:
+            return cls._from_pseudo(get_codec(source_format, flags).translate(initializer))
+        if isinstance(initializer, CompactUmschString):
+            return initializer
+        if not isinstance(initializer, array.array):
+            initializer = array.array('I', initializer)
+        return cls._from_pseudo(_decode(initializer))
+
+    @classmethod
+    def _from_pseudo(cls, pseudo: str):
+        return cls._from_data(*_encode(pseudo))
+
+    @classmethod
+    def _from_data(cls, width: int, data: bytes):
+        self = object.__new__(cls)
+        self._width = width
+        self._data = data
+        return self
+
+    @property
+    def width(self):  # bytes per character
+        return self._width
+
+    @property
+    def nbytes(self):
+        return len(self._data)
+
+    def to_pseudo(self):
+        return _decode_compact(self._width, self._data)
+
+    def thaw(self):  # returns a mutable UmschString copy
+        return from_pseudo(self.to_pseudo())
+
+    def __len__(self):
+        return len(self._data) // self._width
+
+    def __getitem__(self, key):
+        if type(key) == slice:
+            if self._width == 1 and key.step in (None, 1):
+                return CompactUmschString._from_data(1, self._data[key])
+            return CompactUmschString._from_pseudo(self.to_pseudo()[key])
+        if self._width == 1:
+            return ord(_DECODING_TABLE[self._data[key]])
+        return memoryview(self._data).cast(_TYPECODES[self._width])[key]
+
+    def __iter__(self):
+        return map(ord, self.to_pseudo())
+
+    def __hash__(self):
+        return hash(self._data)
+
+    def __eq__(self, other):
+        if isinstance(other, CompactUmschString):
+            return self._width == other._width and self._data == other._data
+        if isinstance(other, array.array):
+            return self.to_pseudo() == _decode(other)
+        return NotImplemented
+
+    def _compare(self, other, operator):
+        if not isinstance(other, CompactUmschString):
+            return NotImplemented
+        if self._width == other._width == 1:  # the one-byte encoding keeps the order of the codes
+            return operator(self._data, other._data)
+        return operator(self.to_pseudo(), other.to_pseudo())
+
+    def __lt__(self, other):
+        return self._compare(other, lt)
+
+    def __le__(self, other):
+        return self._compare(other, le)
+
+    def __gt__(self, other):
+        return self._compare(other, gt)
+
+    def __ge__(self, other):
+        return self._compare(other, ge)
+
+    def __repr__(self):
+        return "CompactUmschString(%r)" % self.to_unicode()
+
+    def upper(self):
+        if self._width == 1:
+            return CompactUmschString._from_data(1, self._data.translate(_UPPER_BYTES))
+        return CompactUmschString._from_pseudo(self.to_pseudo().translate(UPPER_TABLE))
+
+    def lower(self):
+        if self._width == 1:
+            return CompactUmschString._from_data(1, self._data.translate(_LOWER_BYTES))
+        return CompactUmschString._from_pseudo(self.to_pseudo().translate(LOWER_TABLE))
+
+    def filter(self, flags=0):
+        return CompactUmschString._from_pseudo(filter_pseudo(self.to_pseudo(), flags))
+
+    def sort_key(self, flags=0):  # see UmschString.sort_key
+        return pseudo_sort_key(self.to_pseudo(), flags)
+
+    def _search_args(self, sub):  # returns the haystack and needle for a search, as bytes if both are one-byte strings
+        sub = sub if isinstance(sub, CompactUmschString) else CompactUmschString._from_pseudo(_pseudo(sub))
+        if self._width == sub._width == 1:
+            return self._data, sub._data
+        return self.to_pseudo(), sub.to_pseudo()
+
+    def find(self, sub, start=None, end=None):
+        slice_start, slice_end, _ = slice(start, end).indices(len(self))
+        haystack, needle = self._search_args(sub)
+        return haystack.find(needle, slice_start, slice_end)
+
+    def find_all(self, sub, start=None, end=None, overlapping=False):
+        slice_start, slice_end, _ = slice(start, end).indices(len(self))
+        haystack, needle = self._search_args(sub)
+        step = 1 if overlapping else max(len(needle), 1)
+        res = []
+        pos = haystack.find(needle, slice_start, slice_end)
+        while pos != -1:
+            res.append(pos)
+            pos = haystack.find(needle, pos + step, slice_end)
+        return res
+
+    def startswith(self, sub, start=None, end=None):
+        slice_start, slice_end, _ = slice(start, end).indices(len(self))
+        haystack, needle = self._search_args(sub)
+        return haystack.startswith(needle, slice_start, slice_end)
+
+    def endswith(self, sub, start=None, end=None):
+        slice_start, slice_end, _ = slice(start, end).indices(len(self))
+        haystack, needle = self._search_args(sub)
+        return haystack.endswith(needle, slice_start, slice_end)
+
+    def replace(self, old, new, count=None):
+        return CompactUmschString._from_pseudo(self.to_pseudo().replace(_pseudo(old), _pseudo(new), -1 if count is None else count))
+
+    def to_unicode(self, flags=0):
+        return export_pseudo(self.to_pseudo(), Format.UNICODE, flags)
+
+    def to_transliteration(self, flags=0):
+        return export_pseudo(self.to_pseudo(), Format.TRANSLITERATION, flags, True)
+
+
+class CompactColumn:
+    """Packed column of compact strings: the rows are stored one after another in a single bytearray, each with its
+    own width, so a row costs its compact bytes plus one offset and one width byte."""
+    __slots__ = ("data", "offsets", "widths")
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array.array('L', [0])
+        self.widths = array.array('B')
+
+    @classmethod
+    def from_strings(cls, strings, source_format: Format = Format.UNICODE, flags=0):
+        """Imports strings in the source format (or UmschString objects and other rows) into a new column."""
+        res = cls()
+        codec = get_codec(source_format, flags)
+        for item in strings:
+            res.append(codec.translate(item) if type(item) == str else item)
+        return res
+
+    def append(self, item):  # appends a pseudo string, an UmschString or a CompactUmschString
+        width, data = (item._width, item._data) if isinstance(item, CompactUmschString) else _encode(_pseudo(item))
+        self.data += data
+        self.offsets.append(len(self.data))
+        self.widths.append(width)
+
+    def __len__(self):
+        return len(self.widths)
+
+    def __getitem__(self, key):
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("column index out of range")
+        return CompactUmschString._from_data(self.widths[key], bytes(self.data[self.offsets[key]:self.offsets[key + 1]]))
+
+    def __iter__(self):
+        data = self.data
+        offsets = self.offsets
+        for i, width in enumerate(self.widths):
+            yield CompactUmschString._from_data(width, bytes(data[offsets[i]:offsets[i + 1]]))
+
+    @property
+    def nbytes(self):
+        return len(self.data) + self.offsets.itemsize * len(self.offsets) + len(self.widths)
+
+    def to_pseudo_list(self):
+        data = self.data
+        offsets = self.offsets
+        return [_decode_compact(width, data[offsets[i]:offsets[i + 1]]) for i, width in enumerate(self.widths)]
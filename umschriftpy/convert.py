@@ -0,0 +1,106 @@
+# Streaming conversion of text and delimited files
+from collections import deque
+from itertools import islice
+
+from .umschriftpy import Format, UN_COMBINING_CHARS
+from .batch import UmColumn, from_many, to_pseudo_many, to_transliteration_many, to_unicode_many
+
+DEFAULT_CHUNK_SIZE = 1 << 16
+DEFAULT_BATCH_SIZE = 1024
+
+_COMBINING_CHARS = frozenset(map(chr, UN_COMBINING_CHARS))
+
+
+def convert_strings(strings, source_format: Format = Format.UNICODE, output_format: Format = Format.UNICODE, import_flags=0, export_flags=0, filter_flags=0):
+    """Converts a list of strings from the source format to the output format (Format.UNICODE, Format.TRANSLITERATION
+    or None for pseudo strings), optionally filtering them with UmFilter flags."""
+    column = from_many(strings, source_format, import_flags)
+    if filter_flags:
+        column = UmColumn.from_umsch_strings(
+            row.filter(filter_flags) for row in column)
+    if output_format is None:
+        return to_pseudo_many(column)
+    if output_format == Format.TRANSLITERATION:
+        return to_transliteration_many(column, export_flags)
+    return to_unicode_many(column, export_flags)
+
+
+def safe_cut(text: str):
+    """Returns the last position at which the text can be split without separating a character from a following
+    combining mark or splitting a jj sequence. The last character is always held back, as the next chunk may start
+    with a combining mark."""
+    cut = len(text) - 1
+    while cut > 0 and (text[cut] in _COMBINING_CHARS or (text[cut] in "jJ" and text[cut - 1] in "jJ")):
+        cut -= 1
+    return max(cut, 0)
+
+
+def iter_pieces(stream, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """Reads a text stream in lines of at most chunk_size characters. Longer lines are yielded in several pieces,
+    split at safe positions only (see safe_cut)."""
+    carry = ""
+    while True:
+        piece = stream.readline(chunk_size)
+        if not piece:
+            if carry:
+                yield carry
+            return
+        piece = carry + piece
+        carry = ""
+        if not piece.endswith("\n"):
+            cut = safe_cut(piece)
+            piece, carry = piece[:cut], piece[cut:]
+            if not piece:
+                continue
+        yield piece
+
+
+def _batches(iterable, batch_size: int):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, batch_size))
+
+
+def _convert_batches(batches, jobs: int, **options):  # yields converted batches of strings in input order
+    if jobs == 1:
+        return (convert_strings(batch, **options) for batch in batches)
+    from .parallel import imap_convert
+    return imap_convert(batches, jobs, **options)
+
+
+def convert_lines(stream, source_format: Format = Format.UNICODE, output_format: Format = Format.UNICODE, import_flags=0, export_flags=0, filter_flags=0, chunk_size: int = DEFAULT_CHUNK_SIZE, batch_size: int = DEFAULT_BATCH_SIZE, jobs: int = 1):
+    """Converts a text stream line by line, yielding converted pieces of text (with their line breaks) as they are
+    ready. Each batch in flight holds at most batch_size pieces of chunk_size characters.
+    With jobs other than 1 the batches are converted by a process pool (all CPUs if None)."""
+    pending = deque()
+
+    def texts():
+        for batch in _batches(iter_pieces(stream, chunk_size), batch_size):
+            pending.append(batch)
+            yield [piece.rstrip("\r\n") for piece in batch]
+    for converted in _convert_batches(texts(), jobs, source_format=source_format, output_format=output_format,
+                                      import_flags=import_flags, export_flags=export_flags, filter_flags=filter_flags):
+        for piece, result in zip(pending.popleft(), converted):
+            yield result + piece[len(piece.rstrip("\r\n")):]
+
+
+def convert_rows(rows, columns=None, source_format: Format = Format.UNICODE, output_format: Format = Format.UNICODE, import_flags=0, export_flags=0, filter_flags=0, batch_size: int = DEFAULT_BATCH_SIZE, jobs: int = 1):
+    """Converts the given columns (0-based indices, all columns if None) of an iterable of rows, e.g. from csv.reader,
+    yielding the converted rows as lists. With jobs other than 1 the batches are converted by a process pool."""
+    pending = deque()
+
+    def cells():
+        for batch in _batches(rows, batch_size):
+            batch = [list(row) for row in batch]
+            positions = [(row, index) for row in batch for index in (range(len(row)) if columns is None else columns)
+                         if index < len(row)]
+            pending.append((batch, positions))
+            yield [row[index] for row, index in positions]
+    for converted in _convert_batches(cells(), jobs, source_format=source_format, output_format=output_format,
+                                      import_flags=import_flags, export_flags=export_flags, filter_flags=filter_flags):
+        batch, positions = pending.popleft()
+        for (row, index), result in zip(positions, converted):
+            row[index] = result
+        yield from batch
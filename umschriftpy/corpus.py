@@ -0,0 +1,220 @@
+# Memory-mapped on-disk corpus of converted transliterations
+import array
+import mmap
+import struct
+from sys import byteorder
+
+from .umschriftpy import Format, export_pseudo, filter_pseudo, from_buffer, get_codec, _decode, _UTF_32
+from .batch import UmColumn
+from .convert import DEFAULT_BATCH_SIZE, _batches
+
+# File layout: the header, then 8-byte aligned sections with the pseudo codes of all rows (native-endian uint32), their
+# offsets (uint64, count + 1 entries) and optionally the codes and offsets of the normalised keys and the row order by
+# sort key (uint32). Section positions of 0 mark missing sections.
+_MAGIC = b"UMSCORP1"
+_HEADER = struct.Struct("<8sBxxxIQQQQQQQQ")
+_BIG_ENDIAN = byteorder == "big"
+
+
+def _pad(f):
+    f.write(bytes(-f.tell() % 8))
+
+
+def _pseudo_batches(items, source_format: Format, flags, batch_size: int):  # yields (joined pseudo codes, lengths)
+    codec = get_codec(source_format, flags)
+    for batch in _batches(items, batch_size):
+        if isinstance(batch[0], array.array):
+            pseudo = [_decode(item) for item in batch]
+            yield "".join(pseudo), list(map(len, pseudo))
+        else:
+            yield codec.translate_many(batch)
+
+
+def write_corpus(path, items, source_format: Format = Format.UNICODE, flags=0, key_flags=None, sort: bool = True,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+    """Imports strings in the source format (or UmschString objects, e.g. an UmColumn) and writes them to a corpus file.
+    With key_flags the rows filtered with these UmFilter flags are stored as normalised keys; with sort the row order
+    by UmschString.sort_key(key_flags) is stored, which needs all rows in memory while writing. Returns the number of rows."""
+    offsets = array.array('Q', [0])
+    rows = [] if key_flags is not None or sort else None
+    with open(path, "wb") as f:
+        f.write(bytes(_HEADER.size))
+        _pad(f)
+        data_start = f.tell()
+        for joined, lengths in _pseudo_batches(items, source_format, flags, batch_size):
+            f.write(joined.encode(_UTF_32, "surrogatepass"))
+            pos = 0
+            for length in lengths:
+                if rows is not None:
+                    rows.append(joined[pos:pos + length])
+                pos += length
+                offsets.append(offsets[-1] + length)
+        _pad(f)
+        offsets_start = f.tell()
+        f.write(offsets.tobytes())
+        count = len(offsets) - 1
+        key_start = key_length = key_offsets_start = order_start = 0
+        if key_flags is not None:
+            keys = [filter_pseudo(pseudo, key_flags) for pseudo in rows]
+            _pad(f)
+            key_start = f.tell()
+            key_offsets = array.array('Q', [0])
+            for key in keys:
+                f.write(key.encode(_UTF_32, "surrogatepass"))
+                key_offsets.append(key_offsets[-1] + len(key))
+            key_length = key_offsets[-1]
+            _pad(f)
+            key_offsets_start = f.tell()
+            f.write(key_offsets.tobytes())
+        if sort:
+            # pseudo strings compare like their sort keys: by the filtered key first, then by the original
+            order = sorted(range(count), key=(lambda i: (keys[i], rows[i])) if key_flags is not None else rows.__getitem__)
+            _pad(f)
+            order_start = f.tell()
+            f.write(array.array('I', order).tobytes())
+        f.seek(0)
+        f.write(_HEADER.pack(_MAGIC, _BIG_ENDIAN, int(key_flags or 0), count, data_start, offsets[-1], offsets_start,
+                             key_start, key_length, key_offsets_start, order_start))
+    return count
+
+
+class Corpus:
+    """Read-only view of a corpus file written by write_corpus. The file is memory-mapped, so opening it is
+    independent of its size; rows are decoded from the mapped buffers on access."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, big_endian, key_flags, count, data_start, data_length, offsets_start, key_start, key_length, \
+            key_offsets_start, order_start = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC:
+            self._mmap.close()
+            raise ValueError("not an umschriftpy corpus file")
+        if big_endian != _BIG_ENDIAN:
+            self._mmap.close()
+            raise ValueError("corpus file was written on a machine with different byte order")
+        view = memoryview(self._mmap)
+        self._data_start = data_start
+        self._data_end = data_start + 4 * data_length
+        self._data = view[data_start:self._data_end]
+        self._offsets = view[offsets_start:offsets_start + 8 * (count + 1)].cast('Q')
+        self.key_flags = key_flags if key_offsets_start else None
+        self._keys = view[key_start:key_start + 4 * key_length] if key_offsets_start else None
+        self._key_offsets = view[key_offsets_start:key_offsets_start + 8 * (count + 1)].cast('Q') if key_offsets_start else None
+        self._order = view[order_start:order_start + 4 * count].cast('I') if order_start else None
+        self._views = [view, self._data, self._offsets, self._keys, self._key_offsets, self._order]
+
+    def close(self):
+        for view in self._views:
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _check(self, row: int):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("corpus index out of range")
+        return row
+
+    def __getitem__(self, row: int):  # returns a row as an UmschString (a copy of its codes)
+        row = self._check(row)
+        return from_buffer(self._data[4 * self._offsets[row]:4 * self._offsets[row + 1]])
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+    def pseudo(self, row: int):  # returns a row as a pseudo string
+        row = self._check(row)
+        return str(self._data[4 * self._offsets[row]:4 * self._offsets[row + 1]], _UTF_32, "surrogatepass")
+
+    def key(self, row: int):  # returns the normalised key of a row as a pseudo string
+        if self._keys is None:
+            raise ValueError("corpus has no key column")
+        row = self._check(row)
+        return str(self._keys[4 * self._key_offsets[row]:4 * self._key_offsets[row + 1]], _UTF_32, "surrogatepass")
+
+    def to_unicode(self, row: int, flags=0):
+        return export_pseudo(self.pseudo(row), Format.UNICODE, flags)
+
+    def to_transliteration(self, row: int, flags=0):
+        return export_pseudo(self.pseudo(row), Format.TRANSLITERATION, flags, True)
+
+    def to_column(self):  # copies all rows into an UmColumn
+        return UmColumn.from_buffers(self._data, self._offsets)
+
+    def sorted_rows(self):
+        """Returns the row indices in the order of their sort keys (by the normalised keys if the corpus has them)."""
+        if self._order is None:
+            raise ValueError("corpus has no sort order")
+        return self._order
+
+    def _row_at(self, pos: int):  # returns the row containing a code position
+        low, high = 0, len(self)
+        while low < high:
+            mid = (low + high) // 2
+            if self._offsets[mid + 1] <= pos:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def find_all(self, sub):
+        """Returns (row, position) pairs of all non-overlapping occurrences of an UmschString or pseudo string, searching
+        the mapped buffer directly. Occurrences spanning two rows are skipped."""
+        needle = (_decode(sub) if isinstance(sub, array.array) else sub).encode(_UTF_32, "surrogatepass")
+        res = []
+        if not needle:
+            return res
+        pos = self._mmap.find(needle, self._data_start, self._data_end)
+        while pos != -1:
+            if (pos - self._data_start) % 4:  # match not aligned to a code
+                pos = self._mmap.find(needle, pos + 1, self._data_end)
+                continue
+            code = (pos - self._data_start) // 4
+            row = self._row_at(code)
+            if code + len(needle) // 4 <= self._offsets[row + 1]:
+                res.append((row, code - self._offsets[row]))
+                pos += len(needle)
+            else:
+                pos += 4
+            pos = self._mmap.find(needle, pos, self._data_end)
+        return res
+
+    def lookup(self, query):
+        """Returns the rows whose normalised key equals the key of an UmschString or pseudo string, in sort order,
+        by binary search over the stored order."""
+        if self._keys is None or self._order is None:
+            raise ValueError("corpus has no key column or sort order")
+        key = filter_pseudo(_decode(query) if isinstance(query, array.array) else query, self.key_flags)
+        order = self._order
+        low, high = 0, len(order)
+        while low < high:
+            mid = (low + high) // 2
+            if self.key(order[mid]) < key:
+                low = mid + 1
+            else:
+                high = mid
+        res = []
+        while low < len(order) and self.key(order[low]) == key:
+            res.append(order[low])
+            low += 1
+        return res
+
+    def find_pattern(self, pattern, source_format: Format = Format.UNICODE, filter_flags=0):
+        """Returns (row, spans) pairs for the rows matching a pattern.SignPattern (or a pattern string compiled with
+        source_format and filter_flags), decoding each row once."""
+        from .pattern import compile_pattern
+        if isinstance(pattern, str):
+            pattern = compile_pattern(pattern, source_format, filter_flags)
+        return pattern.search_many(self.pseudo(row) for row in range(len(self)))
@@ -0,0 +1,129 @@
+# Automatic detection of the source format of transliteration strings
+from collections import Counter
+from itertools import chain, islice
+from math import exp
+
+from .umschriftpy import ASC_LEFT_PARENTHESIS, ASC_LEFT_SQUARE_BRACKET, ASC_RIGHT_PARENTHESIS, \
+    ASC_RIGHT_SQUARE_BRACKET, PSEUDO_CAPITAL_ALEPH, PSEUDO_LEFT_ANGLE_BRACKET, PSEUDO_RIGHT_ANGLE_BRACKET, \
+    PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, PSEUDO_d_WITH_LINE, Format, IMPORT_DICT, \
+    UN_COMBINING_CHARS, UN_DECODE_BEFORE_COMBINING, cased, get_codec
+from .batch import from_many
+
+# candidate formats, in the order of preference when several convert a sample identically
+CANDIDATES = (Format.UNICODE, Format.TRANSLITERATION, Format.TRLIT_CG_TIMES_2023, Format.TRLIT_CG_TIMES,
+              Format.UMSCHRIFT_TTN)
+DEFAULT_SAMPLE_SIZE = 1000
+
+# plausibility of a character of an imported string, by what the import makes of it
+_LOWER_SIGN = 1.0  # lowercase transliteration sign
+_UPPER_SIGN = 0.5  # capitals at the start of names (inside words they are penalised separately)
+_MARKER = 0.5  # other pseudo codes: morphological dots, half brackets, the suffix pronoun separator
+_SIGN_FROM_DIGIT = 0.5  # digits standing for signs are legitimate, but may as well be numbers
+_UNMAPPED_LETTER = -1.0  # ASCII letters that are not transliteration in this format
+_UNMAPPED_NON_ASCII = -3.0  # characters the format does not know at all
+_INNER_CAPITAL = -2.0  # capitals following a letter inside a word, e.g. from punctuation standing for capitals
+_MISPLACED_BRACKET = -2.0  # closing brackets at the start or opening brackets at the end of a word
+
+_WEIGHTS = {}  # character -> tuple of weights for CANDIDATES
+
+
+def _weight(char: int, code, source_format: Format):
+    if source_format == Format.UNICODE and char in UN_COMBINING_CHARS:
+        return _MARKER  # combining marks are consumed together with the preceding letter
+    if code is None:
+        if char > 0x7F:
+            return _UNMAPPED_NON_ASCII
+        return _UNMAPPED_LETTER if chr(char).isalpha() else 0.0
+    if PSEUDO_CAPITAL_ALEPH <= code <= PSEUDO_d_WITH_LINE:
+        weight = _LOWER_SIGN if not cased(code) or code & 1 else _UPPER_SIGN
+        return min(weight, _SIGN_FROM_DIGIT) if 0x30 <= char <= 0x39 else weight
+    return _MARKER if code > 0x7F else 0.0
+
+
+def _weights(char: str):  # signature of a character: its plausibility under every candidate format
+    res = _WEIGHTS.get(char)
+    if res is None:
+        code = ord(char)
+        res = _WEIGHTS[char] = tuple(_weight(code, IMPORT_DICT[source_format].get(code), source_format)
+                                     for source_format in CANDIDATES)
+    return res
+
+
+# maps the signs of pseudo strings to \x01 (lowercase or uncased) and \x02 (capital) and brackets to \x03 (opening) and
+# \x04 (closing), so that implausible sequences can be counted with str.count
+_CLASS_TABLE = {code: "\x01" if not cased(code) or code & 1 else "\x02"
+                for code in range(PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1)}
+_CLASS_TABLE.update(dict.fromkeys([PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_LEFT_ANGLE_BRACKET, ASC_LEFT_PARENTHESIS,
+                                   ASC_LEFT_SQUARE_BRACKET], "\x03"))
+_CLASS_TABLE.update(dict.fromkeys([PSEUDO_TOP_RIGHT_HALF_BRACKET, PSEUDO_RIGHT_ANGLE_BRACKET, ASC_RIGHT_PARENTHESIS,
+                                   ASC_RIGHT_SQUARE_BRACKET], "\x04"))
+_CLASS_PENALTIES = {"\x01\x02": _INNER_CAPITAL, "\x02\x02": _INNER_CAPITAL, " \x04": _MISPLACED_BRACKET,
+                    "\x03 ": _MISPLACED_BRACKET}
+
+
+def _strip_undecodable(text: str):
+    """Drops the combining marks the import cannot decode together with the preceding character (e.g. x + macron
+    below), which would make the import fail, and marks stacked on another mark. Returns the text and the number of
+    marks dropped."""
+    res = []
+    dropped = 0
+    for char in text:
+        mark = UN_DECODE_BEFORE_COMBINING.get(ord(char))
+        if mark is not None and (not res or ord(res[-1]) not in mark or ord(res[-1]) in UN_COMBINING_CHARS):
+            dropped += 1
+            continue
+        res.append(char)
+    return "".join(res), dropped
+
+
+def _sample(strings: list, sample_size: int):  # evenly spaced sample of a list
+    if len(strings) <= sample_size:
+        return strings
+    step = len(strings) / sample_size
+    return [strings[int(i * step)] for i in range(sample_size)]
+
+
+def detect_format(strings, sample_size: int = DEFAULT_SAMPLE_SIZE):
+    """Returns (Format, confidence) pairs for all candidate formats, best first, for a string or a list of strings
+    (e.g. a column). Only an evenly spaced sample of sample_size strings is scored: every distinct character adds its
+    plausibility under each format, weighted by its frequency, and capitals inside words or misplaced brackets
+    count against a format.
+    The confidences sum to 1."""
+    if isinstance(strings, str):
+        strings = [strings]
+    text = " %s " % " ".join(_sample(list(strings), sample_size))
+    counts = Counter(text)
+    scores = [0.0] * len(CANDIDATES)
+    for char, count in counts.items():
+        for i, weight in enumerate(_weights(char)):
+            scores[i] += weight * count
+    stripped = None
+    for i, source_format in enumerate(CANDIDATES):
+        try:
+            pseudo = get_codec(source_format).translate(text)
+        except KeyError:  # unexpected combining sequences count against the format instead of aborting the detection
+            if stripped is None:
+                stripped = _strip_undecodable(text)
+            pseudo = get_codec(source_format).translate(stripped[0])
+            scores[i] += _UNMAPPED_NON_ASCII * stripped[1]
+        classes = pseudo.translate(_CLASS_TABLE)
+        for sequence, penalty in _CLASS_PENALTIES.items():
+            scores[i] += penalty * classes.count(sequence)
+    # the scores are log-odds: every plausible character adds evidence
+    best = max(scores)
+    odds = [exp(score - best) for score in scores]
+    total_odds = sum(odds)
+    res = [(source_format, value / total_odds) for source_format, value in zip(CANDIDATES, odds)]
+    return sorted(res, key=lambda pair: -pair[1])
+
+
+def from_many_detected(strings, flags=0, sample_size: int = DEFAULT_SAMPLE_SIZE):
+    """Detects the format of a batch of strings from a sample and imports the whole batch with it.
+    Returns the UmColumn and the detected format. Iterators are sampled from their start."""
+    if not isinstance(strings, (list, tuple)):
+        iterator = iter(strings)
+        head = list(islice(iterator, sample_size))
+        source_format = detect_format(head, sample_size)[0][0]
+        return from_many(chain(head, iterator), source_format, flags), source_format
+    source_format = detect_format(strings, sample_size)[0][0]
+    return from_many(strings, source_format, flags), source_format
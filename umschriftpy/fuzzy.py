@@ -0,0 +1,214 @@
+# Weighted edit distance over pseudo codes and a BK-tree index for fuzzy search
+import array
+import heapq
+from math import inf
+
+from .umschriftpy import ASC_HYPHEN_MINUS, ASC_LEFT_PARENTHESIS, ASC_LEFT_SQUARE_BRACKET, ASC_RIGHT_PARENTHESIS, \
+    ASC_RIGHT_SQUARE_BRACKET, ASC_SPACE, PSEUDO_COLON, PSEUDO_DOT, PSEUDO_I_WITH_DIAERESIS, \
+    PSEUDO_I_WITH_INVERTED_BREVE, PSEUDO_MIDDLE_DOT, PSEUDO_RIGHT_HALF_RING, PSEUDO_S, PSEUDO_SMALL_AIN, \
+    PSEUDO_SMALL_ALEPH, PSEUDO_SMALL_YOD, PSEUDO_CAPITAL_AIN, PSEUDO_CAPITAL_ALEPH, PSEUDO_CAPITAL_YOD, \
+    PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, \
+    PSEUDO_U_WITH_INVERTED_BREVE, PSEUDO_W, PSEUDO_Y, PSEUDO_Z, PSEUDO_d_WITH_LINE, \
+    PSEUDO_i_WITH_DIAERESIS, PSEUDO_i_WITH_INVERTED_BREVE, PSEUDO_s, PSEUDO_u_WITH_INVERTED_BREVE, PSEUDO_w, \
+    PSEUDO_y, PSEUDO_z, cased, filter_pseudo, _decode
+
+
+def _pseudo(value):  # accepts UmschString objects (or other code point arrays) and pseudo strings
+    return _decode(value) if isinstance(value, array.array) else value
+
+
+class EditCosts:
+    """Costs of a weighted edit distance over pseudo codes. substitutions maps pairs of codes (ints or characters) to
+    symmetric substitution costs, indels maps codes to insertion/deletion costs; all other edits cost the defaults.
+    The costs are closed under composition (a substitution never costs more than a chain of cheaper edits), so the
+    distance is a metric and can be used in a BK-tree."""
+
+    def __init__(self, substitutions: dict = None, indels: dict = None, default_substitution: float = 1.0, default_indel: float = 1.0):
+        def char(code):
+            return code if isinstance(code, str) else chr(code)
+        self.default_substitution = default_substitution
+        self.default_indel = default_indel
+        substitutions = {(char(a), char(b)): cost for (a, b), cost in (substitutions or {}).items()}
+        indels = {char(a): cost for a, cost in (indels or {}).items()}
+        # metric closure over the characters with explicit costs, the empty string stands for insertions/deletions
+        chars = sorted({c for pair in substitutions for c in pair} | set(indels)) + [""]
+        dist = [[0.0 if a == b else indels.get(a or b, default_indel) if not (a and b)
+                 else substitutions.get((a, b), substitutions.get((b, a), default_substitution)) for b in chars] for a in chars]
+        for k, row_k in enumerate(dist):
+            for row_a in dist:
+                to_k = row_a[k]
+                for b, cost in enumerate(row_k):
+                    if to_k + cost < row_a[b]:
+                        row_a[b] = to_k + cost
+        self.substitutions = {(a, b): dist[i][j] for i, a in enumerate(chars) for j, b in enumerate(chars)
+                              if a and b and a != b and dist[i][j] != default_substitution}
+        self.indels = {a: dist[i][-1] for i, a in enumerate(chars)
+                       if a and dist[i][-1] != default_indel}
+        self.min_indel = min([default_indel, *self.indels.values()])
+
+    def substitution(self, a: str, b: str):
+        if a == b:
+            return 0.0
+        return self.substitutions.get((a, b), self.default_substitution)
+
+    def indel(self, a: str):
+        return self.indels.get(a, self.default_indel)
+
+
+def _egyptological_costs():
+    substitutions = {}
+
+    def cheap(codes, cost):
+        for a in codes:
+            for b in codes:
+                if a != b:
+                    substitutions[a, b] = cost
+    cheap([PSEUDO_SMALL_ALEPH, PSEUDO_SMALL_AIN, PSEUDO_RIGHT_HALF_RING], 0.3)  # ꜣ/ꜥ uncertainty
+    cheap([PSEUDO_CAPITAL_ALEPH, PSEUDO_CAPITAL_AIN, PSEUDO_RIGHT_HALF_RING], 0.3)
+    cheap([PSEUDO_z, PSEUDO_s], 0.2)
+    cheap([PSEUDO_Z, PSEUDO_S], 0.2)
+    cheap([PSEUDO_SMALL_YOD, PSEUDO_i_WITH_INVERTED_BREVE], 0.2)
+    cheap([PSEUDO_CAPITAL_YOD, PSEUDO_I_WITH_INVERTED_BREVE], 0.2)
+    cheap([PSEUDO_w, PSEUDO_u_WITH_INVERTED_BREVE], 0.2)
+    cheap([PSEUDO_W, PSEUDO_U_WITH_INVERTED_BREVE], 0.2)
+    cheap([PSEUDO_y, PSEUDO_i_WITH_DIAERESIS], 0.2)
+    cheap([PSEUDO_Y, PSEUDO_I_WITH_DIAERESIS], 0.2)
+    cheap([PSEUDO_y, PSEUDO_SMALL_YOD], 0.5)  # y also written as ꞽꞽ
+    cheap([PSEUDO_Y, PSEUDO_CAPITAL_YOD], 0.5)
+    cheap([ASC_HYPHEN_MINUS, ASC_SPACE], 0.1)
+    for code in range(PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1, 2):  # case differences
+        if cased(code):
+            substitutions[code, code + 1] = 0.1
+    # markers, brackets and facultative signs in parentheses are often omitted
+    indels = dict.fromkeys([PSEUDO_DOT, PSEUDO_COLON, PSEUDO_MIDDLE_DOT, PSEUDO_SUFFIX_PRONOMEN_SEPARATOR,
+                            PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, ASC_LEFT_SQUARE_BRACKET,
+                            ASC_RIGHT_SQUARE_BRACKET, ASC_LEFT_PARENTHESIS, ASC_RIGHT_PARENTHESIS, ASC_HYPHEN_MINUS], 0.1)
+    indels[PSEUDO_SMALL_YOD] = 0.5  # ꞽ is often omitted or added
+    return EditCosts(substitutions, indels)
+
+
+DEFAULT_COSTS = _egyptological_costs()
+
+
+def distance(a, b, costs: EditCosts = DEFAULT_COSTS, max_distance: float = inf):
+    """Returns the weighted edit distance between two UmschString objects or pseudo strings.
+    With max_distance only a band of the dynamic programming matrix is computed and inf is returned as soon as
+    the distance is known to exceed max_distance."""
+    a = _pseudo(a)
+    b = _pseudo(b)
+    if a == b:
+        return 0.0
+    if len(a) < len(b):
+        a, b = b, a
+    if (len(a) - len(b)) * costs.min_indel > max_distance:
+        return inf
+    band = len(a) if max_distance == inf else int(
+        max_distance / costs.min_indel) if costs.min_indel else len(a)
+    substitution = costs.substitution
+    indel = costs.indel
+    b_indels = [indel(c) for c in b]
+    previous = [0.0]
+    for c in b:
+        previous.append(previous[-1] + indel(c))
+    for i, ca in enumerate(a, 1):
+        low = max(1, i - band)
+        high = min(len(b), i + band)
+        a_indel = indel(ca)
+        current = [inf] * (len(b) + 1)
+        if low == 1:
+            current[0] = previous[0] + a_indel
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = min(previous[j - 1] + substitution(ca, b[j - 1]),
+                       previous[j] + a_indel, current[j - 1] + b_indels[j - 1])
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return inf
+        previous = current
+    # rounding keeps sums of fractional costs comparable, e.g. as BK-tree keys
+    res = round(previous[-1], 9)
+    return res if res <= max_distance else inf
+
+
+class FuzzyIndex:
+    """BK-tree over the (optionally UmFilter-normalised) pseudo strings of names or titles, answering threshold and
+    top-k queries under the weighted edit distance without scanning all entries. Identical keys share one node."""
+
+    def __init__(self, items=(), costs: EditCosts = DEFAULT_COSTS, filter_flags=0):
+        self.costs = costs
+        self.filter_flags = filter_flags
+        self._root = None  # nodes are lists [key, values, {distance: child}]
+        self._size = 0
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return self._size
+
+    def key(self, item):  # normalised pseudo string under which an item is indexed
+        return filter_pseudo(_pseudo(item), self.filter_flags)
+
+    def add(self, item, value=None):
+        """Adds an UmschString or pseudo string; value (the item itself by default) is returned by the queries."""
+        key = self.key(item)
+        value = item if value is None else value
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            d = distance(key, node[0], self.costs)
+            if d == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [key, [value], {}]
+                return
+            node = child
+
+    def _search(self, key, radius, visit):
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            children = node[2]
+            # a node is only useful if it or one of its children can lie within the radius
+            limit = radius() + (max(children) if children else 0)
+            d = distance(key, node[0], self.costs, limit)
+            if d <= radius():
+                visit(d, node)
+            r = radius()
+            for child_distance, child in children.items():
+                if d - r <= child_distance <= d + r:
+                    stack.append(child)
+
+    def search(self, query, max_distance: float):
+        """Returns (distance, value) pairs for all entries within max_distance of the query, closest first."""
+        key = self.key(query)
+        res = []
+        self._search(key, lambda: max_distance,
+                     lambda d, node: res.extend((d, value) for value in node[1]))
+        res.sort(key=lambda pair: pair[0])
+        return res
+
+    def top(self, query, k: int = 10, max_distance: float = inf):
+        """Returns the k closest (distance, value) pairs within max_distance, closest first."""
+        key = self.key(query)
+        best = []  # max-heap by distance of at most k (-distance, counter, value)
+        counter = [0]
+
+        def radius():
+            return -best[0][0] if len(best) >= k else max_distance
+
+        def visit(d, node):
+            for value in node[1]:
+                counter[0] += 1
+                if len(best) < k:
+                    heapq.heappush(best, (-d, counter[0], value))
+                elif d < -best[0][0]:
+                    heapq.heapreplace(best, (-d, counter[0], value))
+        self._search(key, radius, visit)
+        return [(-d, value) for d, _, value in sorted(best, key=lambda entry: (-entry[0], entry[1]))]
@@ -0,0 +1,160 @@
+# Incremental conversion of edited text, e.g. for live preview in editors
+from .umschriftpy import Format, UN_COMBINING_CHARS, get_codec, get_export_table, _pattern
+
+# The import of a character only depends on the character following it (a combining mark) and on the j run it belongs
+# to (the last two j of a run form y); the export maps every pseudo code on its own. Each source character is therefore
+# converted to its own piece of output, and an edit only re-converts the edited text together with the j runs and
+# combining sequences touching it and the character before them. This keeps the lookahead state of
+# UmschString._import_char (the pending combining mark and the yod flag of jj sequences) within the re-converted span.
+_CONTEXT_CHARS = frozenset("jJ").union(map(chr, UN_COMBINING_CHARS))
+# The source is kept in chunks of [source text, output pieces, output length], so that an edit only touches the chunks
+# it falls into and positions are found by walking the chunk lengths instead of the characters.
+_CHUNK_SIZE = 1024  # chunks are split when longer than twice the size and merged with the next when shorter than a quarter
+
+
+class IncrementalConverter:
+    """Keeps a source text and its conversion to the output format (Format.UNICODE, Format.TRANSLITERATION or None for
+    pseudo strings) up to date under edits. edit(position, deleted, inserted) re-converts only the neighbourhood of the
+    edit and returns the change of the output as (position, deleted, inserted), so that an editor can patch its preview.
+    output_offset() and source_offset() map cursor positions between the source and the output."""
+
+    def __init__(self, text: str = "", source_format: Format = Format.UNICODE, output_format: Format = Format.UNICODE,
+                 import_flags=0, export_flags=0):
+        self.codec = get_codec(source_format, import_flags)
+        self.export_table = None if output_format is None else get_export_table(
+            output_format, export_flags, output_format == Format.TRANSLITERATION)
+        self._chunks = [["", [], 0]]  # pieces: output of every source character, empty for combining marks and the last j of a jj
+        self._length = 0
+        self._source = ""
+        self._output = ""
+        if text:
+            self.edit(0, 0, text)
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = "".join(chunk[0] for chunk in self._chunks)
+        return self._source
+
+    @property
+    def output(self):
+        if self._output is None:
+            self._output = "".join(piece for chunk in self._chunks for piece in chunk[1])
+        return self._output
+
+    def __len__(self):
+        return self._length
+
+    def _convert(self, text: str):  # returns the output pieces of the characters of a standalone span
+        table = self.codec.table
+        export = (lambda pseudo: pseudo) if self.export_table is None else (lambda pseudo: pseudo.translate(self.export_table))
+        pieces = []
+        pos = 0
+        for match in _pattern("stateful_span").finditer(text):
+            pieces.extend(export(char.translate(table)) for char in text[pos:match.start()])
+            pseudo = self.codec._translate_span(match)
+            pieces.extend(export(char) for char in pseudo)
+            pieces.extend([""] * (match.end() - match.start() - len(pseudo)))
+            pos = match.end()
+        pieces.extend(export(char.translate(table)) for char in text[pos:])
+        return pieces
+
+    def _locate(self, position: int):  # returns the chunk index of a source position, its offset and the output before
+        source_before = output_before = 0
+        for index, (source, pieces, length) in enumerate(self._chunks):
+            if source_before + len(source) >= position:
+                return index, position - source_before, output_before
+            source_before += len(source)
+            output_before += length
+        raise IndexError("position out of range")
+
+    def _chars_before(self, position: int):  # source characters before position, nearest first
+        index, offset, _ = self._locate(position)
+        for index in range(index, -1, -1):
+            source = self._chunks[index][0]
+            for pos in range(len(source) if offset is None else offset, 0, -1):
+                yield source[pos - 1]
+            offset = None
+
+    def _chars_from(self, position: int):  # source characters from position on
+        index, offset, _ = self._locate(position)
+        for source, pieces, length in self._chunks[index:]:
+            for pos in range(offset, len(source)):
+                yield source[pos]
+            offset = 0
+
+    def edit(self, position: int, deleted: int = 0, inserted: str = ""):
+        """Replaces deleted characters at position of the source with the inserted text. Returns the change of the
+        output as (output position, number of output characters deleted, inserted output text)."""
+        if not (0 <= position and deleted >= 0 and position + deleted <= self._length):
+            raise IndexError("edit out of range")
+        start = position
+        for char in self._chars_before(position):
+            if char not in _CONTEXT_CHARS:
+                break
+            start -= 1
+        start = max(start - 1, 0)  # the character before a combining mark
+        old_end = position + deleted
+        for char in self._chars_from(old_end):
+            if char not in _CONTEXT_CHARS:
+                break
+            old_end += 1
+        first, head, output_before = self._locate(start)
+        last, tail, _ = self._locate(old_end)
+        chunks = self._chunks[first:last + 1]
+        tail = len(chunks[-1][0]) - tail  # characters of the last chunk after the edited span
+        source = "".join(chunk[0] for chunk in chunks)
+        pieces = [piece for chunk in chunks for piece in chunk[1]]
+        old_source = source[head:len(source) - tail]
+        span = old_source[:position - start] + inserted + old_source[position + deleted - start:]
+        new_pieces = self._convert(span)
+        old_output = "".join(pieces[head:len(pieces) - tail])
+        new_output = "".join(new_pieces)
+        output_start = output_before + sum(map(len, pieces[:head]))
+        # the edited chunks, split again if they grew too long
+        source = source[:head] + span + source[len(source) - tail:]
+        pieces[head:len(pieces) - tail] = new_pieces
+        if len(source) < _CHUNK_SIZE // 4 and last + 1 < len(self._chunks):  # merges a short chunk with the next one
+            last += 1
+            source += self._chunks[last][0]
+            pieces += self._chunks[last][1]
+        step = _CHUNK_SIZE if len(source) > 2 * _CHUNK_SIZE else max(len(source), 1)
+        self._chunks[first:last + 1] = [[source[pos:pos + step], pieces[pos:pos + step], sum(map(len, pieces[pos:pos + step]))]
+                                        for pos in range(0, len(source), step)] or \
+            ([] if len(self._chunks) > last + 1 - first else [["", [], 0]])
+        self._length += len(inserted) - deleted
+        self._source = None
+        self._output = None
+        # report the output change without the unchanged ends of the re-converted span
+        prefix = 0
+        while prefix < min(len(old_output), len(new_output)) and old_output[prefix] == new_output[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < min(len(old_output), len(new_output)) - prefix and old_output[-1 - suffix] == new_output[-1 - suffix]:
+            suffix += 1
+        return (output_start + prefix, len(old_output) - prefix - suffix,
+                new_output[prefix:len(new_output) - suffix])
+
+    def set_text(self, text: str):  # replaces the whole source
+        return self.edit(0, self._length, text)
+
+    def output_offset(self, position: int):
+        """Returns the output position corresponding to a source position (e.g. of the cursor)."""
+        if not 0 <= position <= self._length:
+            raise IndexError("position out of range")
+        index, offset, output_before = self._locate(position)
+        return output_before + sum(map(len, self._chunks[index][1][:offset]))
+
+    def source_offset(self, position: int):
+        """Returns the source position corresponding to an output position: the last source position mapped to it,
+        so that a cursor after a converted sign stays after its combining marks."""
+        source_before = output_before = 0
+        for source, pieces, length in self._chunks:
+            if output_before + length > position:  # the position falls into this chunk
+                for offset, piece in enumerate(pieces):
+                    output_before += len(piece)
+                    if output_before > position:
+                        return source_before + offset
+            source_before += len(source)
+            output_before += length
+        return self._length
@@ -0,0 +1,209 @@
+# Opt-in instrumentation of conversions: counters, timings, unmapped characters and hooks
+import threading
+from collections import Counter
+from time import perf_counter
+
+from . import batch
+from . import umschriftpy as core
+from .umschriftpy import PSEUDO_DOT, PSEUDO_d_WITH_LINE, UN_COMBINING_CHARS, Format, UmCodec, UmFilter, UmschString, \
+    get_export_table
+
+# The import methods of UmCodec, the filter and export functions and the searches of UmschString check the hook
+# core._probe, which is only set while instrumentation is enabled, so that disabled instrumentation costs one global
+# lookup per call. Every enable() adds a collector counting the conversions of the calling thread (or of all threads),
+# and disable() removes it again, so that instrumented() blocks nest.
+# Searches of the index modules (ngram, prefix, fuzzy, pattern, corpus) are not timed as searches, only the filtering and
+# export they do; conversions in worker processes (--jobs) and the per-character updates of the incremental converter
+# are not counted.
+STAGES = ("import", "filter", "export", "search")
+
+
+class ConversionStats:
+    """Counters collected while instrumentation is enabled."""
+
+    def __init__(self):
+        self.calls = Counter()  # (stage, format name) -> number of calls
+        self.chars = Counter()  # (stage, format name) -> characters processed
+        self.seconds = Counter()  # stage -> time spent
+        self.unmapped = {}  # (stage, format name) -> Counter of characters without a mapping
+        self.combining = Counter()  # format name -> characters resolved with a following combining mark
+
+    def record(self, stage: str, format_name: str, chars: int, seconds: float):
+        self.calls[stage, format_name] += 1
+        self.chars[stage, format_name] += chars
+        self.seconds[stage] += seconds
+
+    def add_unmapped(self, stage: str, format_name: str, counts):
+        if counts:
+            self.unmapped.setdefault((stage, format_name), Counter()).update(counts)
+
+    def report(self, top: int = 10):
+        """Returns a text summary: calls, characters and time per stage, the most frequent unmapped characters."""
+        lines = []
+        for stage in STAGES:
+            keys = sorted(key for key in self.calls if key[0] == stage)
+            if not keys:
+                continue
+            lines.append("%s: %.3f s" % (stage, self.seconds[stage]))
+            for key in keys:
+                lines.append("  %-24s %10d calls %12d chars" % (key[1], self.calls[key], self.chars[key]))
+        for format_name, count in sorted(self.combining.items()):
+            lines.append("combining marks resolved (%s): %d" % (format_name, count))
+        for (stage, format_name), counts in sorted(self.unmapped.items()):
+            lines.append("unmapped in %s (%s): %s" % (stage, format_name, ", ".join(
+                "U+%04X %r x%d" % (ord(char), char, count) for char, count in counts.most_common(top))))
+        return "\n".join(lines)
+
+
+_collectors = ()  # (stats, thread or None for all threads), replaced as a whole under _lock
+_lock = threading.Lock()
+_hooks = []
+_local = threading.local()  # nesting depth, so that a conversion calling another one is counted once
+
+
+def _format_name(value):
+    return getattr(value, "name", str(value))
+
+
+def _thread_collectors():  # the stats collecting the conversions of the current thread
+    thread = threading.current_thread()
+    return [stats for stats, owner in _collectors if owner is None or owner is thread]
+
+
+def _probe(function, *args):
+    """Set as core._probe while instrumentation is enabled: times outermost calls of the current thread's collectors
+    and records them with the description of _TARGETS[function]."""
+    if getattr(_local, "depth", 0):
+        return core._UNMEASURED
+    collectors = _thread_collectors()
+    if not collectors:
+        return core._UNMEASURED
+    _local.depth = 1
+    try:
+        start = perf_counter()
+        res = function(*args)
+        seconds = perf_counter() - start
+    finally:
+        _local.depth = 0
+    stage, describe = _TARGETS[function]
+    format_name, chars, unmapped, combining = describe(*args)
+    with _lock:
+        for stats in collectors:
+            stats.record(stage, format_name, chars, seconds)
+            stats.add_unmapped(stage, format_name, unmapped)
+            if combining:
+                stats.combining[format_name] += combining
+    for hook in _hooks:
+        hook(stage, format_name, chars, seconds)
+    return res
+
+
+def _count_import(codec: UmCodec, text: str):
+    counts = Counter(text)
+    import_dict = codec.import_dict
+    # characters passed through unchanged, apart from ASCII spaces, digits and punctuation, which are kept by design
+    unmapped = {char: count for char, count in counts.items() if ord(char) not in import_dict and
+                ord(char) not in UN_COMBINING_CHARS and (ord(char) > 0x7F or char.isalpha())}
+    combining = sum(count for char, count in counts.items() if ord(char) in UN_COMBINING_CHARS)
+    return _format_name(codec.source_format), len(text), unmapped, combining
+
+
+def _describe_translate_many(codec: UmCodec, strings: list):
+    return _count_import(codec, "".join(strings))
+
+
+def _count_export(pseudo: str, output_format, flags, discard_not_found: bool):
+    table = get_export_table(output_format, flags, discard_not_found)
+    counts = Counter(pseudo)
+    # dropped characters when discarding, otherwise pseudo codes leaking into the output
+    unmapped = {char: count for char, count in counts.items() if ord(char) not in table and (
+        discard_not_found or PSEUDO_DOT <= ord(char) <= PSEUDO_d_WITH_LINE)}
+    return _format_name(output_format), len(pseudo), unmapped, 0
+
+
+def _describe_export_rows(rows: list, output_format, flags, discard_not_found: bool):
+    # counts the decoded rows passed in, the items are not iterated again
+    return _count_export("".join(rows), output_format, flags, discard_not_found)
+
+
+def _describe_filter(pseudo: str, flags):
+    return (UmFilter(flags).name or "none") if flags else "none", len(pseudo), None, 0
+
+
+def _describe_string(string: UmschString, *args):  # searches on an UmschString
+    return "UmschString", len(string), None, 0
+
+
+# instrumented function -> (stage, describe), describe(*args) returning (format name, characters processed, unmapped
+# characters, combining marks resolved)
+_TARGETS = {UmCodec.translate: ("import", _count_import),
+            UmCodec.translate_many: ("import", _describe_translate_many),
+            core.filter_pseudo: ("filter", _describe_filter),
+            core.filter_positions: ("filter", _describe_filter),
+            core.export_pseudo: ("export", _count_export),
+            batch._export_rows: ("export", _describe_export_rows),
+            UmschString.find: ("search", _describe_string),
+            UmschString.find_all: ("search", _describe_string),
+            UmschString.replace: ("search", _describe_string)}
+
+
+def enable(stats: ConversionStats = None, all_threads: bool = False):
+    """Starts collecting counters and timings (into a new ConversionStats unless stats is given) and returns the stats.
+    Only conversions in the calling thread are counted, unless all_threads is set (e.g. for executor threads)."""
+    global _collectors
+    stats = stats if stats is not None else ConversionStats()
+    with _lock:
+        _collectors += ((stats, None if all_threads else threading.current_thread()),)
+        core._probe = _probe
+    return stats
+
+
+def disable(stats: ConversionStats = None):
+    """Stops collecting into stats (by default the last stats enabled) and returns them. The hook is removed when
+    no collector is left."""
+    global _collectors
+    with _lock:
+        for index in range(len(_collectors) - 1, -1, -1):
+            if stats is None or _collectors[index][0] is stats:
+                stats = _collectors[index][0]
+                _collectors = _collectors[:index] + _collectors[index + 1:]
+                break
+        else:
+            return None
+        if not _collectors:
+            core._probe = None
+    return stats
+
+
+def enabled():  # True if conversions of the current thread are counted
+    return bool(_thread_collectors())
+
+
+def stats():  # the stats collecting the conversions of the current thread (None if instrumentation is disabled)
+    collectors = _thread_collectors()
+    return collectors[-1] if collectors else None
+
+
+def add_hook(hook):
+    """Registers hook(stage, format name, characters, seconds), called after every instrumented conversion,
+    e.g. to feed a metrics system."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+
+class instrumented:
+    """Context manager enabling instrumentation for a block: with instrumented() as stats: ..."""
+
+    def __init__(self, stats: ConversionStats = None, all_threads: bool = False):
+        self.stats = stats
+        self.all_threads = all_threads
+
+    def __enter__(self):
+        self.stats = enable(self.stats, self.all_threads)
+        return self.stats
+
+    def __exit__(self, *exc_info):
+        disable(self.stats)
@@ -0,0 +1,78 @@
+# Record linkage: matching entries of two databases on normalised transliteration keys
+from enum import IntEnum
+
+from .umschriftpy import Format, UmFilter, filter_pseudo, get_codec
+
+
+class MatchLevel(IntEnum):
+    EXACT = 1  # identical transliteration/transcription
+    CLEANED = 2  # equal after removing markers, brackets and punctuation, hyphens and case differences
+    VARIANTS = 3  # equal after also replacing variant signs (UmFilter.REPLACE_ALL)
+
+
+# UmFilter flags producing the key of every match level
+LEVEL_FILTERS = {MatchLevel.EXACT: UmFilter(0),
+                 MatchLevel.CLEANED: UmFilter.CLEAN | UmFilter.HYPHENS | UmFilter.LOWER,
+                 MatchLevel.VARIANTS: UmFilter.CLEAN | UmFilter.HYPHENS | UmFilter.LOWER | UmFilter.REPLACE_ALL}
+
+
+class Match:
+    __slots__ = ("left", "right", "level")
+
+    def __init__(self, left, right, level: MatchLevel):
+        self.left = left
+        self.right = right
+        self.level = level
+
+    def __iter__(self):
+        return iter((self.left, self.right, self.level))
+
+    def __eq__(self, other):
+        return isinstance(other, Match) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        return "Match(%r, %r, %s)" % (self.left, self.right, self.level.name)
+
+
+def match_keys(text: str, source_format: Format = Format.UNICODE, flags=0):
+    """Returns the pseudo-string keys of a transliteration for all match levels (exact, cleaned, variants)."""
+    exact = get_codec(source_format, flags).translate(text)
+    cleaned = filter_pseudo(exact, LEVEL_FILTERS[MatchLevel.CLEANED])
+    return exact, cleaned, filter_pseudo(cleaned, LEVEL_FILTERS[MatchLevel.VARIANTS])
+
+
+def _keyed(records, field, source_format: Format, flags, partitions: int, partition: int):
+    for record in records:
+        keys = match_keys(record if field is None else field(
+            record), source_format, flags)
+        if partitions == 1 or hash(keys[-1]) % partitions == partition:
+            yield record, keys
+
+
+def _iterate(records):  # re-iterable inputs can be given as callables returning a fresh iterator
+    return records() if callable(records) else records
+
+
+def link(left, right, left_format: Format = Format.UNICODE, right_format: Format = Format.UNICODE, left_field=None,
+         right_field=None, left_flags=0, right_flags=0, max_level: MatchLevel = MatchLevel.VARIANTS, partitions: int = 1):
+    """Matches the records of two streams on normalised transliteration keys and yields a Match for every matching
+    pair with the strongest level at which the two are equal (up to max_level).
+
+    The match keys of every record are computed once, the left records are held in a hash index and the right records
+    are streamed through it, so linking takes O(n + m) time plus the number of matches. left_field and right_field
+    extract the transliteration from a record (the record itself by default). To bound memory for very large inputs,
+    partitions > 1 splits the join into that many passes over both inputs, each holding only part of the left index;
+    the inputs must then be sequences or callables returning a fresh iterator."""
+    max_level = MatchLevel(max_level)
+    levels = [level for level in MatchLevel if level <= max_level]
+    index_level = max_level - 1
+    for partition in range(partitions):
+        index = {}
+        for record, keys in _keyed(_iterate(left), left_field, left_format, left_flags, partitions, partition):
+            index.setdefault(keys[index_level], []).append((record, keys))
+        for record, keys in _keyed(_iterate(right), right_field, right_format, right_flags, partitions, partition):
+            for candidate, candidate_keys in index.get(keys[index_level], ()):
+                for level in levels:
+                    if candidate_keys[level - 1] == keys[level - 1]:
+                        yield Match(candidate, record, level)
+                        break
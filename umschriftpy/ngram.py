@@ -0,0 +1,166 @@
+# Inverted q-gram index for variant-insensitive full-text search over many texts
+import array
+import struct
+import zlib
+
+from .umschriftpy import UmFilter, filter_positions, filter_pseudo, from_pseudo, _decode
+
+_MAGIC = b"UMNG"
+_HEADER = struct.Struct("<IIQ")  # q, filter flags, number of documents
+
+
+def _pseudo(value):  # accepts UmschString objects (or other code point arrays) and pseudo strings
+    return _decode(value) if isinstance(value, array.array) else value
+
+
+class NgramIndex:
+    """Inverted index over the q-grams of UmFilter-normalised pseudo strings. The default flags ignore brackets,
+    morphological dots and similar markers as well as case, so a query matches texts regardless of their source
+    format and editorial marks. Candidates from the intersected posting lists are verified on the normalised text
+    and the matches are reported as spans of the original text."""
+
+    def __init__(self, items=(), q: int = 3, filter_flags=UmFilter.CLEAN | UmFilter.LOWER):
+        self.q = q
+        self.filter_flags = filter_flags
+        self._documents = []  # pseudo strings, None for removed documents
+        self._postings = {}  # q-gram -> array of increasing document ids
+        self._short = array.array('I')  # ids of documents too short to contain a q-gram
+        self._removed = 0
+        for item in items:
+            self.add(item)
+
+    def __len__(self):
+        return len(self._documents) - self._removed
+
+    def _grams(self, key: str):
+        q = self.q
+        return {key[i:i + q] for i in range(len(key) - q + 1)}
+
+    def add(self, item):
+        """Adds an UmschString or pseudo string and returns its document id."""
+        pseudo = _pseudo(item)
+        doc_id = len(self._documents)
+        self._documents.append(pseudo)
+        postings = self._postings
+        key = filter_pseudo(pseudo, self.filter_flags)
+        if len(key) < self.q:
+            self._short.append(doc_id)
+        for gram in self._grams(key):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array.array('I')
+            posting.append(doc_id)
+        return doc_id
+
+    def remove(self, doc_id: int):
+        """Removes a document. Its id stays in the posting lists until compact() and is skipped by queries."""
+        if self.document(doc_id) is None:
+            raise KeyError(doc_id)
+        self._documents[doc_id] = None
+        self._removed += 1
+
+    def compact(self):  # drops the ids of removed documents from the posting lists
+        documents = self._documents
+        for gram, posting in list(self._postings.items()):
+            posting = array.array('I', (doc_id for doc_id in posting if documents[doc_id] is not None))
+            if posting:
+                self._postings[gram] = posting
+            else:
+                del self._postings[gram]
+        self._short = array.array('I', (doc_id for doc_id in self._short if documents[doc_id] is not None))
+
+    def document(self, doc_id: int):
+        """Returns a document as an UmschString (None if it was removed)."""
+        pseudo = self._documents[doc_id]
+        return None if pseudo is None else from_pseudo(pseudo)
+
+    def _candidates(self, key: str):
+        if len(key) < self.q:  # the candidates are the documents with a q-gram containing the key and short documents
+            candidates = set(self._short)
+            for gram, posting in self._postings.items():
+                if key in gram:
+                    candidates.update(posting)
+            return sorted(candidates)
+        postings = []
+        for gram in self._grams(key):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return ()
+            postings.append(posting)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                break
+        return sorted(candidates)
+
+    def search(self, query):
+        """Returns (document id, spans) pairs for all documents containing the normalised query (an UmschString or pseudo
+        string), where spans are the (start, end) positions of the non-overlapping matches in the original document."""
+        key = filter_pseudo(_pseudo(query), self.filter_flags)
+        res = []
+        if not key:
+            return res
+        for doc_id in self._candidates(key):
+            pseudo = self._documents[doc_id]
+            if pseudo is None:
+                continue
+            if key not in filter_pseudo(pseudo, self.filter_flags):
+                continue
+            filtered, positions = filter_positions(pseudo, self.filter_flags)
+            spans = []
+            pos = filtered.find(key)
+            while pos != -1:
+                spans.append((positions[pos], positions[pos + len(key) - 1] + 1))
+                pos = filtered.find(key, pos + len(key))
+            res.append((doc_id, spans))
+        return res
+
+    def to_bytes(self):
+        """Serialises the index with its documents and posting lists, compressed with zlib."""
+        out = bytearray(_HEADER.pack(self.q, int(self.filter_flags), len(self._documents)))
+        for pseudo in self._documents:
+            encoded = b"" if pseudo is None else pseudo.encode("utf-8", "surrogatepass")
+            out += struct.pack("<i", -1 if pseudo is None else len(encoded)) + encoded
+        out += struct.pack("<Q", len(self._short)) + self._short.tobytes()
+        out += struct.pack("<Q", len(self._postings))
+        for gram, posting in self._postings.items():
+            encoded = gram.encode("utf-8", "surrogatepass")
+            out += struct.pack("<II", len(encoded), len(posting)) + encoded
+            out += posting.tobytes()
+        return _MAGIC + zlib.compress(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("not a serialised NgramIndex")
+        data = zlib.decompress(data[len(_MAGIC):])
+        q, flags, count = _HEADER.unpack_from(data)
+        res = cls(q=q, filter_flags=UmFilter(flags))
+        pos = _HEADER.size
+        for _ in range(count):
+            length, = struct.unpack_from("<i", data, pos)
+            pos += 4
+            if length < 0:
+                res._documents.append(None)
+                res._removed += 1
+            else:
+                res._documents.append(data[pos:pos + length].decode("utf-8", "surrogatepass"))
+                pos += length
+        short, = struct.unpack_from("<Q", data, pos)
+        pos += 8
+        res._short.frombytes(data[pos:pos + 4 * short])
+        pos += 4 * short
+        grams, = struct.unpack_from("<Q", data, pos)
+        pos += 8
+        for _ in range(grams):
+            length, size = struct.unpack_from("<II", data, pos)
+            pos += 8
+            gram = data[pos:pos + length].decode("utf-8", "surrogatepass")
+            pos += length
+            posting = array.array('I')
+            posting.frombytes(data[pos:pos + 4 * size])
+            pos += 4 * size
+            res._postings[gram] = posting
+        return res
@@ -0,0 +1,77 @@
+# Multi-core conversion of large corpora
+import array
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .umschriftpy import Format, UmschString
+from .batch import UmColumn, from_many
+from .convert import DEFAULT_BATCH_SIZE, convert_strings, _batches
+
+# Codecs and export tables are cached per process, so every worker builds them once on its first batch.
+# Results are sent back packed: converted strings joined into one str plus their lengths,
+# imported columns as the raw bytes of their buffers.
+
+
+def _convert_batch(strings: list, options: dict):
+    result = convert_strings(strings, **options)
+    return "".join(result), array.array('L', map(len, result)).tobytes()
+
+
+def _unpack_strings(packed):
+    text, lengths = packed
+    lengths = array.array('L', lengths)
+    res = []
+    pos = 0
+    for length in lengths:
+        res.append(text[pos:pos + length])
+        pos += length
+    return res
+
+
+def _import_batch(strings: list, source_format: Format, flags):
+    column = from_many(strings, source_format, flags)
+    return column.data.tobytes(), column.offsets.tobytes()
+
+
+def _imap(function, batches, jobs, *args):
+    """Runs function over the batches in a process pool, yielding the results in input order.
+    At most two batches per worker are in flight, so the input is consumed lazily."""
+    jobs = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(jobs) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(function, batch, *args))
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def imap_convert(batches, jobs: int = None, **options):
+    """Converts an iterable of string batches in a process pool, yielding the converted batches in input order.
+    Takes the keyword arguments of convert.convert_strings."""
+    for packed in _imap(_convert_batch, batches, jobs, options):
+        yield _unpack_strings(packed)
+
+
+def convert_parallel(strings, source_format: Format = Format.UNICODE, output_format: Format = Format.UNICODE, import_flags=0, export_flags=0, filter_flags=0, jobs: int = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Converts strings like convert.convert_strings using jobs worker processes (all CPUs if None).
+    Returns the converted strings in input order."""
+    res = []
+    for converted in imap_convert(_batches(strings, batch_size), jobs, source_format=source_format, output_format=output_format,
+                                  import_flags=import_flags, export_flags=export_flags, filter_flags=filter_flags):
+        res.extend(converted)
+    return res
+
+
+def from_many_parallel(strings, source_format: Format = Format.UNICODE, flags=0, jobs: int = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Imports strings into one UmColumn like from_many using jobs worker processes (all CPUs if None)."""
+    data = UmschString()
+    offsets = array.array('L', [0])
+    for data_bytes, offsets_bytes in _imap(_import_batch, _batches(strings, batch_size), jobs, source_format, flags):
+        base = len(data)
+        data.frombytes(data_bytes)
+        batch_offsets = array.array('L', offsets_bytes)
+        offsets.extend(offset + base for offset in batch_offsets[1:])
+    return UmColumn(data, offsets)
@@ -0,0 +1,198 @@
+# Sign-class patterns over pseudo strings, translated into regular expressions
+import array
+import re
+from functools import lru_cache
+
+from .umschriftpy import PSEUDO_CAPITAL_ALEPH, PSEUDO_CAPITAL_YOD, PSEUDO_COLON, PSEUDO_DOT, PSEUDO_I_WITH_DIAERESIS, \
+    PSEUDO_I_WITH_INVERTED_BREVE, PSEUDO_LEFT_ANGLE_BRACKET, PSEUDO_MIDDLE_DOT, PSEUDO_RIGHT_ANGLE_BRACKET, \
+    PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, \
+    PSEUDO_U_WITH_INVERTED_BREVE, PSEUDO_W, PSEUDO_Y, PSEUDO_d_WITH_LINE, Format, filter_positions, filter_pseudo, \
+    get_codec, _decode
+from .batch import UmColumn, to_pseudo_many
+
+# Pattern syntax: transliteration in the source format matches itself; [...] and [^...] are sets of signs, {name} a
+# named class, (...) a group, | alternation, ?, *, +, {m}, {m,} and {m,n} repeat the preceding sign, set, class or
+# group. \ escapes the metacharacters ()[]{}|?*+\ so that they are matched as text.
+_METACHARACTERS = "()[]{}|?*+\\"
+
+
+def _upper_and_lower(*codes):  # capital letters have even codes, the lowercase letter follows
+    return "".join(chr(code) + chr(code + 1) for code in codes)
+
+
+# named classes: strings of single signs, or tuples of sign sequences (in Unicode transliteration)
+CLASSES = {
+    "sign": "".join(map(chr, range(PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1))),
+    "weak": _upper_and_lower(PSEUDO_CAPITAL_ALEPH, PSEUDO_CAPITAL_YOD, PSEUDO_Y, PSEUDO_I_WITH_DIAERESIS,
+                             PSEUDO_I_WITH_INVERTED_BREVE, PSEUDO_W, PSEUDO_U_WITH_INVERTED_BREVE),
+    "marker": "".join(map(chr, (PSEUDO_DOT, PSEUDO_MIDDLE_DOT, PSEUDO_COLON, PSEUDO_SUFFIX_PRONOMEN_SEPARATOR))),
+    "bracket": "".join(map(chr, (PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, PSEUDO_LEFT_ANGLE_BRACKET,
+                                 PSEUDO_RIGHT_ANGLE_BRACKET))) + "()[]〈〉{}",
+    "suffix": ("ꞽ", "k", "ṯ", "f", "s", "n", "ny", "tn", "ṯn", "sn", "st", "tw", "wꞽ"),
+}
+_REPEAT = re.compile(r"\{(\d+)(,(\d*))?\}")
+
+
+def _escape(pseudo: str):
+    return "".join(re.escape(char) for char in pseudo)
+
+
+class _Translator:
+    def __init__(self, pattern: str, source_format: Format, filter_flags):
+        self.pattern = pattern
+        self.codec = get_codec(source_format)
+        self.filter_flags = filter_flags
+        self.pos = 0
+        self.out = []
+
+    def error(self, message: str):
+        return ValueError("%s at position %d of sign pattern %r" % (message, self.pos, self.pattern))
+
+    def signs(self, text: str):  # imports and filters literal text, returning the pseudo codes one by one
+        return [filter_pseudo(char, self.filter_flags) for char in self.codec.translate(text)]
+
+    def literal(self, text: str):  # every sign is a separate atom, so that a repeat applies to the last one
+        for sign in self.signs(text):
+            self.out.append(_escape(sign) if len(sign) == 1 else "(?:%s)" % _escape(sign))
+
+    def read_literal(self):  # reads a run of text and escaped metacharacters, imported together
+        run = []
+        pattern = self.pattern
+        while self.pos < len(pattern) and (pattern[self.pos] not in _METACHARACTERS or pattern[self.pos] == "\\"):
+            if pattern[self.pos] == "\\":
+                if self.pos + 1 == len(pattern):
+                    raise self.error("trailing backslash")
+                self.pos += 1
+            run.append(pattern[self.pos])
+            self.pos += 1
+        self.literal("".join(run))
+
+    def read_set(self):
+        end = self.pattern.find("]", self.pos + 1)
+        while end != -1 and self.pattern[end - 1] == "\\":
+            end = self.pattern.find("]", end + 1)
+        if end == -1:
+            raise self.error("unterminated [")
+        content = self.pattern[self.pos + 1:end]
+        negated = content.startswith("^")
+        if negated:
+            content = content[1:]
+        content = re.sub(r"\\(.)", r"\1", content)
+        signs = sorted({sign for sign in self.signs(content) if sign})
+        if any(len(sign) > 1 for sign in signs):
+            raise self.error("sets can only hold single signs")
+        if not signs:
+            raise self.error("empty set")
+        self.out.append("[%s%s]" % ("^" if negated else "", _escape("".join(signs))))
+        self.pos = end + 1
+
+    def read_braces(self):
+        repeat = _REPEAT.match(self.pattern, self.pos)
+        if repeat:
+            if not self.out or self.out[-1] in ("(?:", "|"):
+                raise self.error("nothing to repeat")
+            self.out.append(repeat.group())
+            self.pos = repeat.end()
+            return
+        end = self.pattern.find("}", self.pos)
+        name = self.pattern[self.pos + 1:end] if end != -1 else None
+        if name not in CLASSES:
+            raise self.error("unknown class {%s}" % name if name is not None else "unterminated {")
+        members = CLASSES[name]
+        if isinstance(members, tuple):  # sign sequences in Unicode transliteration, longest first
+            codec = get_codec(Format.UNICODE)
+            sequences = {filter_pseudo(codec.translate(member), self.filter_flags) for member in members}
+            self.out.append("(?:%s)" % "|".join(_escape(sequence) for sequence in sorted(sequences, key=lambda s: (-len(s), s))))
+        else:
+            signs = sorted({filter_pseudo(char, self.filter_flags) for char in members} - {""})
+            self.out.append("[%s]" % _escape("".join(signs)))
+        self.pos = end + 1
+
+    def translate(self):
+        pattern = self.pattern
+        depth = 0
+        while self.pos < len(pattern):
+            char = pattern[self.pos]
+            if char == "[":
+                self.read_set()
+            elif char == "{":
+                self.read_braces()
+            elif char == "(":
+                depth += 1
+                self.out.append("(?:")
+                self.pos += 1
+            elif char == ")":
+                if not depth:
+                    raise self.error("unbalanced )")
+                depth -= 1
+                self.out.append(")")
+                self.pos += 1
+            elif char in "|?*+":
+                if char != "|" and (not self.out or self.out[-1] in ("(?:", "|")):
+                    raise self.error("nothing to repeat")
+                self.out.append(char)
+                self.pos += 1
+            elif char in "]}":
+                raise self.error("unbalanced %s" % char)
+            else:
+                self.read_literal()
+        if depth:
+            raise self.error("unbalanced (")
+        return "".join(self.out)
+
+
+def _pseudo(value):  # accepts UmschString objects (or other code point arrays) and pseudo strings
+    return _decode(value) if isinstance(value, array.array) else value
+
+
+class SignPattern:
+    """Pattern over transliteration signs, e.g. SignPattern("sḏm⸗{suffix}") or SignPattern("[ꜣꜥ]{weak}?n"), written in
+    the source format. It is translated once into a regular expression over pseudo strings filtered with filter_flags,
+    so that with UmFilter.CLEAN | UmFilter.LOWER a pattern also matches bracketed or capitalised text. Every string is
+    searched in a single pass and matches are reported as (start, end) spans of the unfiltered string."""
+
+    def __init__(self, pattern: str, source_format: Format = Format.UNICODE, filter_flags=0):
+        self.pattern = pattern
+        self.source_format = source_format
+        self.filter_flags = filter_flags
+        self.regex = re.compile(_Translator(pattern, source_format, filter_flags).translate(), re.DOTALL)
+
+    def __repr__(self):
+        return "SignPattern(%r)" % self.pattern
+
+    def find_all(self, text):
+        """Returns the (start, end) spans of all non-overlapping, non-empty matches in an UmschString or pseudo string."""
+        pseudo = _pseudo(text)
+        if not self.filter_flags:
+            return [match.span() for match in self.regex.finditer(pseudo) if match.end() > match.start()]
+        if not self.regex.search(filter_pseudo(pseudo, self.filter_flags)):
+            return []
+        filtered, positions = filter_positions(pseudo, self.filter_flags)
+        return [(positions[match.start()], positions[match.end() - 1] + 1) for match in self.regex.finditer(filtered)
+                if match.end() > match.start()]
+
+    def search(self, text):  # returns the span of the first match, None if there is none
+        spans = self.find_all(text)
+        return spans[0] if spans else None
+
+    def fullmatch(self, text):  # True if the whole (filtered) string matches the pattern
+        pseudo = _pseudo(text)
+        return self.regex.fullmatch(filter_pseudo(pseudo, self.filter_flags) if self.filter_flags else pseudo) is not None
+
+    def search_many(self, items):
+        """Searches an iterable of UmschString objects or pseudo strings (e.g. an UmColumn or a Corpus) and returns
+        (row, spans) pairs for the rows with matches."""
+        if isinstance(items, UmColumn):
+            items = to_pseudo_many(items)
+        res = []
+        for row, item in enumerate(items):
+            spans = self.find_all(item)
+            if spans:
+                res.append((row, spans))
+        return res
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str, source_format: Format = Format.UNICODE, filter_flags=0):
+    """Returns a cached SignPattern."""
+    return SignPattern(pattern, source_format, filter_flags)
@@ -0,0 +1,157 @@
+# Prefix index for autocompletion over normalised pseudo codes
+import array
+import zlib
+from bisect import bisect_left, bisect_right
+
+from .umschriftpy import UmFilter, filter_pseudo, from_pseudo, _decode
+
+_MAGIC = b"UMPX"
+
+
+def _pseudo(value):  # accepts UmschString objects (or other code point arrays) and pseudo strings
+    return _decode(value) if isinstance(value, array.array) else value
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos: int):
+    res = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        res |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return res, pos
+        shift += 7
+
+
+class PrefixIndex:
+    """Sorted array of (key, pseudo string) entries, where the key is the pseudo string filtered with UmFilter flags.
+    Completions of a prefix are found by binary search and returned in the order of the keys."""
+
+    def __init__(self, items=(), filter_flags=UmFilter.CLEAN | UmFilter.LOWER):
+        self.filter_flags = filter_flags
+        entries = sorted((self.key(pseudo), pseudo) for pseudo in map(_pseudo, items))
+        self._keys = [key for key, _ in entries]
+        self._values = [pseudo for _, pseudo in entries]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def key(self, item):  # normalised pseudo string under which an item is indexed
+        return filter_pseudo(_pseudo(item), self.filter_flags)
+
+    def add(self, item):
+        """Inserts an UmschString or pseudo string."""
+        pseudo = _pseudo(item)
+        key = self.key(pseudo)
+        pos = bisect_right(self._keys, key)
+        while pos > 0 and self._keys[pos - 1] == key and self._values[pos - 1] > pseudo:
+            pos -= 1
+        self._keys.insert(pos, key)
+        self._values.insert(pos, pseudo)
+
+    def remove(self, item):
+        """Removes one occurrence of an UmschString or pseudo string, raises ValueError if it is not indexed."""
+        pseudo = _pseudo(item)
+        key = self.key(pseudo)
+        pos = bisect_left(self._keys, key)
+        while pos < len(self._keys) and self._keys[pos] == key:
+            if self._values[pos] == pseudo:
+                del self._keys[pos]
+                del self._values[pos]
+                return
+            pos += 1
+        raise ValueError("item not in index")
+
+    def __contains__(self, item):
+        pseudo = _pseudo(item)
+        key = self.key(pseudo)
+        pos = bisect_left(self._keys, key)
+        while pos < len(self._keys) and self._keys[pos] == key:
+            if self._values[pos] == pseudo:
+                return True
+            pos += 1
+        return False
+
+    def _range(self, prefix):
+        key = self.key(prefix)
+        start = bisect_left(self._keys, key)
+        # every key starting with the prefix sorts before prefix + the highest code point
+        return start, bisect_left(self._keys, key + "\U0010FFFF", start)
+
+    def count(self, prefix):
+        start, stop = self._range(prefix)
+        return stop - start
+
+    def complete(self, prefix, n: int = 10, unique: bool = True):
+        """Returns up to n UmschString objects whose normalised form starts with the normalised prefix (an UmschString
+        or pseudo string). With unique, entries sharing a key are returned once."""
+        start, stop = self._range(prefix)
+        res = []
+        previous = None
+        for pos in range(start, stop):
+            if len(res) >= n:
+                break
+            if unique and self._keys[pos] == previous:
+                continue
+            previous = self._keys[pos]
+            res.append(from_pseudo(self._values[pos]))
+        return res
+
+    def to_bytes(self):
+        """Serialises the index: keys are front-coded against the previous key, the original pseudo string is only
+        stored where it differs from the key and the result is compressed with zlib."""
+        out = bytearray()
+        _write_varint(out, int(self.filter_flags))
+        _write_varint(out, len(self._keys))
+        previous = b""
+        for key, pseudo in zip(self._keys, self._values):
+            encoded = key.encode("utf-8", "surrogatepass")
+            shared = 0
+            limit = min(len(previous), len(encoded))
+            while shared < limit and previous[shared] == encoded[shared]:
+                shared += 1
+            _write_varint(out, shared)
+            _write_varint(out, len(encoded) - shared)
+            out += encoded[shared:]
+            if pseudo == key:
+                _write_varint(out, 0)
+            else:
+                original = pseudo.encode("utf-8", "surrogatepass")
+                _write_varint(out, len(original) + 1)
+                out += original
+            previous = encoded
+        return _MAGIC + zlib.compress(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if data[:len(_MAGIC)] != _MAGIC:
+            raise ValueError("not a serialised PrefixIndex")
+        data = zlib.decompress(data[len(_MAGIC):])
+        flags, pos = _read_varint(data, 0)
+        count, pos = _read_varint(data, pos)
+        res = cls(filter_flags=UmFilter(flags))
+        keys = res._keys
+        values = res._values
+        previous = b""
+        for _ in range(count):
+            shared, pos = _read_varint(data, pos)
+            length, pos = _read_varint(data, pos)
+            encoded = previous[:shared] + data[pos:pos + length]
+            pos += length
+            key = encoded.decode("utf-8", "surrogatepass")
+            length, pos = _read_varint(data, pos)
+            if length:
+                values.append(data[pos:pos + length - 1].decode("utf-8", "surrogatepass"))
+                pos += length - 1
+            else:
+                values.append(key)
+            keys.append(key)
+            previous = encoded
+        return res
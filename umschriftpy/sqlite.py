@@ -0,0 +1,110 @@
+# SQLite integration: collation and deterministic scalar functions backed by the cached codecs
+import sqlite3
+
+from .umschriftpy import Format, UmExport, UmFilter, UmImport, export_pseudo, filter_pseudo, get_codec, parse_flags, \
+    pseudo_sort_key
+
+PSEUDO = "pseudo"  # format name for columns holding to_pseudo() strings
+
+_FORMATS = {}
+_FLAGS = {}
+
+
+def _format(value):  # resolves a format name ("unicode", "trlit_cg_times", "pseudo", ...) or a Format value
+    res = _FORMATS.get(value)
+    if res is None:
+        if isinstance(value, str) and value.lower() == PSEUDO:
+            res = PSEUDO
+        elif isinstance(value, str):
+            res = Format[value.upper()]
+        else:
+            res = Format(value)
+        _FORMATS[value] = res
+    return res
+
+
+def _flags(flag_type, value):
+    key = (flag_type, value)
+    res = _FLAGS.get(key)
+    if res is None:
+        res = _FLAGS[key] = parse_flags(flag_type, value)
+    return res
+
+
+def _import(text: str, fmt, flags=0):  # converts a value of the given format into a pseudo string
+    source_format = _format(fmt)
+    if source_format == PSEUDO:
+        return text
+    return get_codec(source_format, _flags(UmImport, flags)).translate(text)
+
+
+def umsch_import(text, fmt=PSEUDO, flags=0):
+    """Returns the pseudo string of a value in the given format, using UmImport flags."""
+    if text is None:
+        return None
+    return _import(text, fmt, flags)
+
+
+def umsch_to_unicode(text, fmt=PSEUDO, flags=0):
+    """Returns a value of the given format as Unicode, using UmExport flags."""
+    if text is None:
+        return None
+    return export_pseudo(_import(text, fmt), Format.UNICODE, _flags(UmExport, flags))
+
+
+def umsch_to_transliteration(text, fmt=PSEUDO, flags=0):
+    """Returns a value of the given format as a string for the Transliteration font, using UmExport flags."""
+    if text is None:
+        return None
+    return export_pseudo(_import(text, fmt), Format.TRANSLITERATION, _flags(UmExport, flags), True)
+
+
+def umsch_filter(pseudo, flags=0):
+    """Returns a pseudo string filtered with UmFilter flags."""
+    if pseudo is None:
+        return None
+    return filter_pseudo(pseudo, _flags(UmFilter, flags))
+
+
+def umsch_key(text, fmt=PSEUDO, flags=UmFilter.CLEAN | UmFilter.LOWER):
+    """Returns the normalised match key of a value in the given format: its pseudo string filtered with UmFilter flags.
+    Equal keys group together and keys sort in the order of the pseudo codes."""
+    if text is None:
+        return None
+    return filter_pseudo(_import(text, fmt), _flags(UmFilter, flags))
+
+
+def collation(flags=UmFilter.CLEAN | UmFilter.LOWER, cache_size: int = 1 << 16):
+    """Returns a collation function comparing pseudo strings by their UmschString.sort_key with UmFilter flags.
+    Sorting compares every value many times, so the keys of up to cache_size values are kept."""
+    keys = {}
+
+    def key(value: str):
+        res = keys.get(value)
+        if res is None:
+            if len(keys) >= cache_size:
+                keys.clear()
+            res = keys[value] = pseudo_sort_key(value, flags)
+        return res
+
+    def compare(a: str, b: str):
+        a = key(a)
+        b = key(b)
+        return (a > b) - (a < b)
+    return compare
+
+
+def register(connection: sqlite3.Connection, collation_name: str = "UMSCHRIFT", collation_flags=UmFilter.CLEAN | UmFilter.LOWER):
+    """Registers the UMSCHRIFT collation (for columns holding pseudo strings) and the scalar functions umsch_import,
+    umsch_to_unicode, umsch_to_transliteration, umsch_filter and umsch_key on a connection.
+    Formats are passed by name ('unicode', 'umschrift_ttn', 'transliteration', 'trlit_cg_times', 'trlit_cg_times_2023'
+    or 'pseudo') and flags as integers or comma-separated names such as 'CLEAN,LOWER'."""
+    connection.create_collation(collation_name, collation(collation_flags))
+    for function in (umsch_import, umsch_to_unicode, umsch_to_transliteration, umsch_key):
+        for narg in (1, 2, 3):
+            connection.create_function(
+                function.__name__, narg, function, deterministic=True)
+    for narg in (1, 2):
+        connection.create_function(
+            "umsch_filter", narg, umsch_filter, deterministic=True)
+    return connection
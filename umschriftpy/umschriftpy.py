@@ -1,6 +1,7 @@
 # pyUmschrift
 import array
 from sys import byteorder
+from weakref import WeakValueDictionary
 # from .constants import *
 # from .dicts import *
 from enum import IntEnum, IntFlag, auto
@@ -50,6 +51,23 @@ class UmFilter(IntFlag):
     HYPHENS = auto()  # replaces all hyphens with spaces
 
 
+def parse_flags(flag_type, value):
+    """Returns a flag value of flag_type (UmImport, UmExport or UmFilter) from an int, a flag
+    or a comma-separated string of flag names such as "CLEAN,LOWER"."""
+    if not isinstance(value, str):
+        return flag_type(value or 0)
+    res = flag_type(0)
+    for name in value.split(","):
+        name = name.strip().upper()
+        if name:
+            try:
+                res |= flag_type[name]
+            except KeyError:
+                raise ValueError("unknown %s flag %s" %
+                                 (flag_type.__name__, name)) from None
+    return res
+
+
 ASC_SPACE = 32
 
 ASC_SUFFIX_PRONOMEN_SEPARATOR = 61
@@ -322,6 +340,14 @@ UN_DECODE_BEFORE_COMBINING_DOT_BELOW = {ASC_k: PSEUDO_q,
 UN_DECODE_BEFORE_COMBINING_HALF_RING_ABOVE = {ASC_i: PSEUDO_SMALL_YOD,
                                               UN_SMALL_DOTLESS_I: PSEUDO_SMALL_YOD,
                                               ASC_I: PSEUDO_CAPITAL_YOD}
+# combining marks mapped to the tables decoding the character preceding them
+UN_DECODE_BEFORE_COMBINING = {UN_COMBINING_MACRON_BELOW: UN_DECODE_BEFORE_COMBINING_MACRON,
+                              UN_COMBINING_CIRCUMFLEX_BELOW: UN_DECODE_BEFORE_COMBINING_CIRCUMFLEX,
+                              UN_COMBINING_INVERTED_BREVE: UN_DECODE_BEFORE_COMBINING_INVERTED_BREVE,
+                              UN_COMBINING_RIGHT_HALF_RING_ABOVE: UN_DECODE_BEFORE_COMBINING_HALF_RING_ABOVE,
+                              UN_COMBINING_CYRILLIC_PSILI_PNEUMATA: UN_DECODE_BEFORE_COMBINING_HALF_RING_ABOVE,
+                              UN_COMBINING_DOT_BELOW: UN_DECODE_BEFORE_COMBINING_DOT_BELOW}
+UN_COMBINING_CHARS = frozenset(UN_DECODE_BEFORE_COMBINING)
 IMPORT_DICT = {Format.UMSCHRIFT_TTN: {ASC_Y: PSEUDO_Y, ASC_L: PSEUDO_L, 0x00C7: PSEUDO_T_WITH_LINE, 0x008D: PSEUDO_SMALL_ALEPH, 0x0160: ASC_TILDE, 0x03BC: PSEUDO_E, 0x00CB: ASC_PLUS, 0x00F4: PSEUDO_d, 0xa6: PSEUDO_SMALL_YOD, ASC_QUOTE: PSEUDO_H_WITH_DOT, 0x7e: PSEUDO_i_WITH_DIAERESIS, ASC_X: PSEUDO_h_WITH_BREVE, ASC_NUMBER: PSEUDO_SMALL_ALEPH, ASC_o: PSEUDO_SMALL_AIN, 0x7c: PSEUDO_SMALL_YOD, ASC_H: PSEUDO_h_WITH_DOT, ASC_x: PSEUDO_h_WITH_LINE, 0xc8: PSEUDO_s, ASC_Q: PSEUDO_q, ASC_T: PSEUDO_t_WITH_LINE, ASC_D: PSEUDO_d_WITH_LINE, ASC_EXCLAMATION_MARK: PSEUDO_H, ASC_AT: PSEUDO_d_WITH_LINE, ASC_DOLLAR: PSEUDO_H_WITH_LINE, ASC_PERCENT: PSEUDO_H_WITH_BREVE, ASC_CIRCUMFLEX_ACCENT: ASC_LEFT_PARENTHESIS, ASC_AMPERSAND: PSEUDO_TOP_LEFT_HALF_BRACKET, ASC_LOW_LINE: PSEUDO_u_WITH_INVERTED_BREVE, ASC_PLUS: PSEUDO_i_WITH_INVERTED_BREVE, ASC_O: PSEUDO_H_WITH_DOT, ASC_V: PSEUDO_T_WITH_LINE, ASC_v: PSEUDO_T, ASC_EQUALS: PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, ASC_e: PSEUDO_D, ASC_A: PSEUDO_RIGHT_HALF_RING, ASC_APOSTROPHE: PSEUDO_RIGHT_HALF_RING, 0x5c: PSEUDO_TOP_RIGHT_HALF_BRACKET, ASC_c: PSEUDO_S, 0xb3: PSEUDO_d, 0xb2: PSEUDO_t_WITH_LINE, ASC_E: PSEUDO_D_WITH_LINE, ASC_SECTION: PSEUDO_h_WITH_CURCUMFLEX, 0xdf: PSEUDO_t_WITH_CURCUMFLEX, 0xb5: PSEUDO_E, 0xc0: ASC_A, 0x2020: ASC_c, 0x2030: PSEUDO_T, 0x2122: PSEUDO_SMALL_ALEPH, 0xa1: ASC_LOW_LINE, 0xa3: PSEUDO_T_WITH_CURCUMFLEX, ASC_YEN: PSEUDO_e, 0xa9: PSEUDO_h_WITH_CURCUMFLEX, 0xc4: PSEUDO_Q, 0xc6: PSEUDO_d, 0xca: PSEUDO_CAPITAL_YOD, 0xcb: ASC_PLUS, 0xcf: PSEUDO_SMALL_YOD, 0xd2: ASC_O, 0xd3: ASC_o, 0xd6: PSEUDO_Q, 0xd9: PSEUDO_D_WITH_LINE, 0xdc: PSEUDO_S, 0xe6: PSEUDO_D, 0xe7: PSEUDO_t_WITH_LINE, 0xea: PSEUDO_e, 0xfb: PSEUDO_q, ASC_S: PSEUDO_s_WITH_CARON, ASC_C: PSEUDO_S_WITH_CARON, 0xbd: ASC_LEFT_PARENTHESIS},
                Format.UNICODE: {ASC_Y: PSEUDO_Y, ASC_L: PSEUDO_L, UN_I_WITH_DIAERESIS: PSEUDO_I_WITH_DIAERESIS, ASC_E: PSEUDO_E, ASC_e: PSEUDO_e, UN_SMALL_ALEPH: PSEUDO_SMALL_ALEPH, UN_CAPITAL_ALEPH: PSEUDO_CAPITAL_ALEPH, UN_SMALL_YOD: PSEUDO_SMALL_YOD, UN_CAPITAL_YOD: PSEUDO_CAPITAL_YOD, UN_i_WITH_INVERTED_BREVE: PSEUDO_i_WITH_INVERTED_BREVE, UN_I_WITH_INVERTED_BREVE: PSEUDO_I_WITH_INVERTED_BREVE, UN_RIGHT_HALF_RING: PSEUDO_RIGHT_HALF_RING, UN_SMALL_AIN: PSEUDO_SMALL_AIN, UN_CAPITAL_AIN: PSEUDO_CAPITAL_AIN, UN_u_WITH_INVERTED_BREVE: PSEUDO_u_WITH_INVERTED_BREVE, UN_U_WITH_INVERTED_BREVE: PSEUDO_U_WITH_INVERTED_BREVE, ASC_H: PSEUDO_H, UN_h_WITH_DOT: PSEUDO_h_WITH_DOT, UN_H_WITH_DOT: PSEUDO_H_WITH_DOT, UN_h_WITH_BREVE: PSEUDO_h_WITH_BREVE, UN_H_WITH_BREVE: PSEUDO_H_WITH_BREVE, UN_h_WITH_CURCUMFLEX: PSEUDO_h_WITH_CURCUMFLEX, UN_H_WITH_CURCUMFLEX: PSEUDO_H_WITH_CURCUMFLEX, UN_h_WITH_LINE: PSEUDO_h_WITH_LINE, UN_H_WITH_LINE: PSEUDO_H_WITH_LINE, ASC_S: PSEUDO_S, UN_s_WITH_CARON: PSEUDO_s_WITH_CARON, UN_S_WITH_CARON: PSEUDO_S_WITH_CARON, ASC_q: PSEUDO_q, ASC_Q: PSEUDO_Q, ASC_T: PSEUDO_T, UN_t_WITH_CURCUMFLEX: PSEUDO_t_WITH_CURCUMFLEX, UN_T_WITH_CURCUMFLEX: PSEUDO_T_WITH_CURCUMFLEX, UN_t_WITH_LINE: PSEUDO_t_WITH_LINE, UN_T_WITH_LINE: PSEUDO_T_WITH_LINE, ASC_D: PSEUDO_D, UN_d_WITH_LINE: PSEUDO_d_WITH_LINE, UN_D_WITH_LINE: PSEUDO_D_WITH_LINE, ASC_DOT: PSEUDO_DOT, UN_MIDDLE_DOT: PSEUDO_MIDDLE_DOT, ASC_COLON: PSEUDO_COLON, UN_SUFFIX_PRONOMEN_SEPARATOR: PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, UN_TOP_LEFT_HALF_BRACKET: PSEUDO_TOP_LEFT_HALF_BRACKET, UN_TOP_RIGHT_HALF_BRACKET: PSEUDO_TOP_RIGHT_HALF_BRACKET, UN_LEFT_ANGLE_BRACKET: PSEUDO_LEFT_ANGLE_BRACKET, UN_RIGHT_ANGLE_BRACKET: PSEUDO_RIGHT_ANGLE_BRACKET, UN_TOP_LEFT_HALF_BRACKET: PSEUDO_TOP_LEFT_HALF_BRACKET, UN_TOP_RIGHT_HALF_BRACKET: PSEUDO_TOP_RIGHT_HALF_BRACKET, UN_LEFT_ANGLE_BRACKET: PSEUDO_LEFT_ANGLE_BRACKET, UN_RIGHT_ANGLE_BRACKET: PSEUDO_RIGHT_ANGLE_BRACKET, UN_MIDDLE_DOT: PSEUDO_MIDDLE_DOT, ASC_D: PSEUDO_D, ASC_H: PSEUDO_H, ASC_S: PSEUDO_S, ASC_T: PSEUDO_T, UN_SMALL_ALEPH: PSEUDO_SMALL_ALEPH, UN_CAPITAL_ALEPH: PSEUDO_SMALL_ALEPH, 0x21d: PSEUDO_SMALL_ALEPH, 0x21c: PSEUDO_SMALL_ALEPH, UN_CAPITAL_AIN: PSEUDO_SMALL_AIN, UN_SMALL_AIN: PSEUDO_SMALL_AIN, 0x2bf: PSEUDO_SMALL_AIN, 0xec41: PSEUDO_d_WITH_LINE, UN_H_WITH_LINE: PSEUDO_H_WITH_LINE, UN_H_WITH_CURCUMFLEX: PSEUDO_H_WITH_CURCUMFLEX, UN_h_WITH_CURCUMFLEX: PSEUDO_h_WITH_CURCUMFLEX, 0xec42: PSEUDO_SMALL_ALEPH, 0xec43: PSEUDO_SMALL_AIN, UN_i_WITH_INVERTED_BREVE: PSEUDO_i_WITH_INVERTED_BREVE, UN_u_WITH_INVERTED_BREVE: PSEUDO_u_WITH_INVERTED_BREVE, 0xec46: PSEUDO_SMALL_YOD, 0xec49: PSEUDO_CAPITAL_YOD, UN_SUFFIX_PRONOMEN_SEPARATOR: PSEUDO_SUFFIX_PRONOMEN_SEPARATOR, UN_k_WITH_DOT: PSEUDO_q, UN_K_WITH_DOT: PSEUDO_Q, UN_s_WITH_ACUTE: PSEUDO_s, UN_S_WITH_ACUTE: PSEUDO_S, UN_t_WITH_DOT: ASC_d, UN_T_WITH_DOT: ASC_D, UN_c_WITH_CARON: PSEUDO_t_WITH_LINE, UN_C_WITH_CARON: PSEUDO_T_WITH_LINE},
                Format.TRLIT_CG_TIMES: {ASC_Y: PSEUDO_Y, ASC_L: 0x2E25, UN_I_WITH_DIAERESIS: PSEUDO_I_WITH_DIAERESIS, ASC_E: PSEUDO_E, ASC_e: PSEUDO_e, ASC_x: PSEUDO_h_WITH_BREVE, ASC_A: PSEUDO_SMALL_ALEPH, ASC_a: PSEUDO_SMALL_AIN, ASC_i: PSEUDO_SMALL_YOD, ASC_H: PSEUDO_h_WITH_DOT, ASC_X: PSEUDO_h_WITH_LINE, ASC_c: PSEUDO_s, ASC_S: PSEUDO_s_WITH_CARON, ASC_q: PSEUDO_q, ASC_T: PSEUDO_t_WITH_LINE, ASC_D: PSEUDO_d_WITH_LINE, ASC_o: PSEUDO_q, 0x30: PSEUDO_H, 0x31: PSEUDO_H_WITH_DOT, 0x32: PSEUDO_H_WITH_BREVE, 0x33: PSEUDO_H_WITH_LINE, 0x34: PSEUDO_S, 0x35: PSEUDO_S_WITH_CARON, 0x36: PSEUDO_T, 0x37: PSEUDO_T_WITH_LINE, 0x38: PSEUDO_D, 0x39: PSEUDO_D_WITH_LINE, ASC_Q: PSEUDO_Q, ASC_I: PSEUDO_CAPITAL_YOD, ASC_O: PSEUDO_Q, ASC_C: PSEUDO_S, ASC_V: PSEUDO_T_WITH_CURCUMFLEX, ASC_v: PSEUDO_t_WITH_CURCUMFLEX, ASC_EQUALS: PSEUDO_SUFFIX_PRONOMEN_SEPARATOR},
@@ -387,6 +413,271 @@ EXPORT_MULTICHAR_DICT = {Format.UNICODE: {PSEUDO_i_WITH_INVERTED_BREVE: array.ar
     Format.TRANSLITERATION: {}}
 
 
+# Regular expressions are compiled on first use to keep the import of the module cheap
+_PATTERN_SOURCES = {
+    # the only spans of an input string that need the stateful import logic:
+    # runs of two or more j/J (jj sequences) and characters followed by a combining mark
+    "stateful_span": "(?s)[jJ]{2,}(?![%s])|.(?=([%s]))" % (("".join(map(chr, sorted(UN_COMBINING_CHARS))),) * 2),
+    # parentheses and the signs enclosed in them, an unclosed parenthesis extends to the end of the string
+    "facultative_signs": r"\([^)]*\)?"}
+_PATTERNS = {}
+
+# Hook of umschriftpy.instrument: while instrumentation is enabled, the instrumented functions pass their calls to
+# _probe(function, *args), which calls and measures them, or returns _UNMEASURED for calls made while measuring
+_probe = None
+_UNMEASURED = object()
+
+
+def _pattern(name: str):
+    pattern = _PATTERNS.get(name)
+    if pattern is None:
+        import re
+        pattern = _PATTERNS[name] = re.compile(_PATTERN_SOURCES[name])
+    return pattern
+
+
+class UmCodec:
+    """Precompiled import tables for one source format and one set of UmImport flags.
+    Use get_codec() to obtain cached instances instead of creating them directly."""
+    __slots__ = ("source_format", "flags", "import_dict",
+                 "table", "stateful_span")
+
+    def __init__(self, source_format: Format = Format.UNICODE, flags=0):
+        self.source_format = source_format
+        self.flags = flags
+        import_dict = dict(IMPORT_DICT[source_format])
+        if flags & UmImport.S_FOR_Z:
+            import_dict.update(IMPORT_DICT_S_FOR_Z[source_format])
+        self.import_dict = import_dict
+        # str.translate table: remapped characters only, stray combining marks are dropped
+        self.table = {char: code for char,
+                      code in import_dict.items() if char != code}
+        self.table.update(dict.fromkeys(UN_COMBINING_CHARS))
+        self.stateful_span = _pattern("stateful_span")
+
+    def translate(self, value: str):  # converts a string to a string of pseudo characters
+        if _probe is not None:
+            res = _probe(UmCodec.translate, self, value)
+            if res is not _UNMEASURED:
+                return res
+        if not self.stateful_span.search(value):
+            return value.translate(self.table)
+        pieces = []
+        pos = 0
+        for match in self.stateful_span.finditer(value):
+            pieces.append(value[pos:match.start()].translate(self.table))
+            pieces.append(self._translate_span(match))
+            pos = match.end()
+        pieces.append(value[pos:].translate(self.table))
+        return "".join(pieces)
+
+    def _translate_span(self, match):  # imports a stateful span character by character with UmschString._import_char
+        span = match.group()
+        # a character is followed by its combining mark, the last j of a jj sequence by a character other than j
+        next_chars = [ord(match.group(1))] if match.group(1) else [*map(ord, span[1:]), 0]
+        yod_flag = [0]
+        res = []
+        for current_char, next_char in zip(map(ord, span), next_chars):
+            code = UmschString._import_char(self.import_dict, current_char, next_char, self.source_format, yod_flag)
+            if code:
+                res.append(chr(code))
+        return "".join(res)
+
+    def translate_many(self, strings: list):  # converts a list of strings, returns the joined pseudo string and the row lengths
+        if _probe is not None:
+            res = _probe(UmCodec.translate_many, self, strings)
+            if res is not _UNMEASURED:
+                return res
+        # without jj sequences and combining marks the import maps characters one to one,
+        # so all rows can be translated at once and the lengths taken from the input
+        if not self.stateful_span.search("\n" + "\n".join(strings)):
+            return "".join(strings).translate(self.table), list(map(len, strings))
+        rows = [self.translate(value) for value in strings]
+        return "".join(rows), list(map(len, rows))
+
+    def import_string(self, value: str):  # imports a string to an UmschString object
+        return UmschString(map(ord, self.translate(value)))
+
+
+_CODECS = {}
+
+
+def get_codec(source_format: Format = Format.UNICODE, flags=0):
+    """Returns the cached UmCodec for the given source format and UmImport flags."""
+    key = (source_format, int(flags))
+    codec = _CODECS.get(key)
+    if codec is None:
+        codec = _CODECS[key] = UmCodec(source_format, flags)
+    return codec
+
+
+_UTF_32 = "utf_32_le" if byteorder == "little" else "utf_32_be"
+
+
+def _decode(codes: array.array):  # decodes an array of code points into a string
+    if codes.itemsize != 4:  # e.g. arrays of type 'L', which is 8 bytes wide on some platforms
+        codes = array.array('I', codes)
+    return codes.tobytes().decode(_UTF_32, "surrogatepass")
+
+
+class _DiscardingTable(dict):  # str.translate table dropping all characters without an entry
+    def __missing__(self, key):
+        return None
+
+
+_EXPORT_TABLES = {}
+
+
+def get_export_table(output_format: Format = Format.UNICODE, flags=0, discard_not_found: bool = False):
+    """Returns the cached str.translate table converting pseudo strings to the output format with the given UmExport flags."""
+    key = (output_format, int(flags), discard_not_found)
+    table = _EXPORT_TABLES.get(key)
+    if table is None:
+        table = _EXPORT_TABLES[key] = _build_export_table(
+            output_format, flags, discard_not_found)
+    return table
+
+
+def export_pseudo(pseudo: str, output_format: Format = Format.UNICODE, flags=0, discard_not_found: bool = False):
+    """Converts a pseudo string to the output format with the given UmExport flags."""
+    if _probe is not None:
+        res = _probe(export_pseudo, pseudo, output_format, flags, discard_not_found)
+        if res is not _UNMEASURED:
+            return res
+    return pseudo.translate(get_export_table(output_format, flags, discard_not_found))
+
+
+def _build_export_table(output_format: Format, flags, discard_not_found: bool):
+    export_dict = dict(EXPORT_DICT[output_format])
+    if flags & UmExport.K_WITH_DOT:
+        export_dict.update(EXPORT_DICT_K_WITH_DOT[output_format])
+    if flags & UmExport.J_FOR_YOD:
+        export_dict.update(EXPORT_DICT_J_FOR_YOD[output_format])
+    if flags & UmExport.Z_FOR_S_AND_S_FOR_S_ACUTE:
+        export_dict.update(EXPORT_DICT_S_ACUTE[output_format])
+    export_multichar_dict = EXPORT_MULTICHAR_DICT[output_format]
+    # signs replaced before the export
+    replaces = {}
+    if flags & UmExport.REPLACE_I_WITH_DIAERESIS:
+        replaces.update({PSEUDO_I_WITH_DIAERESIS: [PSEUDO_Y],
+                         PSEUDO_i_WITH_DIAERESIS: [PSEUDO_y]})
+    if flags & UmExport.JJ_FOR_DOUBLE_YOD:
+        replaces.update({PSEUDO_y: [ASC_j, ASC_j], PSEUDO_Y: [ASC_J, ASC_j],
+                         PSEUDO_I_WITH_DIAERESIS: [ASC_J, ASC_j], PSEUDO_i_WITH_DIAERESIS: [ASC_j, ASC_j]})
+
+    def export_char(char):
+        if char in export_multichar_dict:
+            return _decode(export_multichar_dict[char])
+        if char in export_dict:
+            return chr(export_dict[char])
+        return "" if discard_not_found else chr(char)
+    table = _DiscardingTable() if discard_not_found else {}
+    for char in set(export_dict) | set(export_multichar_dict) | set(replaces):
+        table[char] = "".join(export_char(c)
+                              for c in replaces.get(char, [char]))
+    return table
+
+
+_FILTER_TABLES = {}
+
+
+def get_filter_table(flags=0):
+    """Returns the cached str.translate table applying the deletions, replacements and case folding of the UmFilter flags
+    to pseudo strings. UmFilter.FACULTATIVE is not part of the table."""
+    key = int(flags) & ~UmFilter.FACULTATIVE
+    table = _FILTER_TABLES.get(key)
+    if table is None:
+        table = _FILTER_TABLES[key] = _build_filter_table(flags)
+    return table
+
+
+def _build_filter_table(flags):
+    filtered_signs = []
+    replaces = {}
+    if flags & UmFilter.MORPH:
+        filtered_signs.extend(
+            [PSEUDO_DOT, PSEUDO_COLON, PSEUDO_MIDDLE_DOT])
+    if flags & UmFilter.SUFF_PRON:
+        filtered_signs.extend([PSEUDO_SUFFIX_PRONOMEN_SEPARATOR])
+    if flags & UmFilter.BRACKETS:
+        filtered_signs.extend([PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, PSEUDO_LEFT_ANGLE_BRACKET, PSEUDO_RIGHT_ANGLE_BRACKET, ASC_LEFT_PARENTHESIS, ASC_RIGHT_PARENTHESIS,
+                               ASC_LEFT_SQUARE_BRACKET, ASC_RIGHT_SQUARE_BRACKET, ASC_LESS_THAN_SIGN, ASC_GREATER_THAN_SIGN, ASC_LEFT_CURLY_BRACKET, ASC_RIGHT_CURLY_BRACKET, ASC_VERTICAL_LINE])
+    if flags & UmFilter.PUNCT:
+        filtered_signs.extend(
+            [PSEUDO_DOT, ASC_COMMA, ASC_QUESTION_MARK, ASC_EXCLAMATION_MARK, ASC_QUOTE])
+    if flags & UmFilter.DIGITS:
+        filtered_signs.extend(range(ASC_ZERO, ASC_NINE))
+    if flags & UmFilter.HYPHENS:
+        replaces.update({ASC_HYPHEN_MINUS: ASC_SPACE,
+                        UN_MINUS_SIGN: ASC_SPACE})
+        replaces.update(dict.fromkeys(
+            range(UN_HYPHEN, UN_HORIZONTAL_BAR), ASC_SPACE))
+    if flags & UmFilter.REPLACE_I_WITH_DIAERESIS:
+        replaces.update({PSEUDO_i_WITH_DIAERESIS: PSEUDO_y,
+                         PSEUDO_I_WITH_DIAERESIS: PSEUDO_Y})
+    if flags & UmFilter.REPLACE_INVERTED_BREVES:
+        replaces.update({PSEUDO_i_WITH_INVERTED_BREVE: PSEUDO_SMALL_YOD,
+                         PSEUDO_I_WITH_INVERTED_BREVE: PSEUDO_CAPITAL_YOD,
+                        PSEUDO_u_WITH_INVERTED_BREVE: PSEUDO_w,
+                        PSEUDO_U_WITH_INVERTED_BREVE: PSEUDO_W})
+    if flags & UmFilter.REPLACE_UNCERTAIN_CONSONANT:
+        replaces.update({PSEUDO_RIGHT_HALF_RING: PSEUDO_SMALL_ALEPH})
+    if flags & UmFilter.REPLACE_Z:
+        replaces.update({PSEUDO_Z: PSEUDO_S, PSEUDO_z: PSEUDO_s})
+    # replacements take precedence over deletions
+    table = dict.fromkeys(filtered_signs)
+    table.update(replaces)
+    if flags & UmFilter.LOWER:
+        for char in range(PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1):
+            table.setdefault(char, char)
+        table = {char: code + (~code & 1) if code is not None and cased(code) else code
+                 for char, code in table.items()}
+    return {char: code for char, code in table.items() if char != code}
+
+
+def filter_pseudo(pseudo: str, flags=0):  # applies UmFilter flags to a pseudo string
+    if _probe is not None:
+        res = _probe(filter_pseudo, pseudo, flags)
+        if res is not _UNMEASURED:
+            return res
+    if flags & UmFilter.FACULTATIVE:
+        pseudo = _pattern("facultative_signs").sub("", pseudo)
+    return pseudo.translate(get_filter_table(flags))
+
+
+def filter_positions(pseudo: str, flags=0):
+    """Filters a pseudo string like filter_pseudo and also returns, for every character of the result, its position
+    in the unfiltered string. The filter only deletes or replaces single characters, so the positions are increasing."""
+    if _probe is not None:
+        res = _probe(filter_positions, pseudo, flags)
+        if res is not _UNMEASURED:
+            return res
+    table = get_filter_table(flags)
+    spans = [(0, len(pseudo))]
+    if flags & UmFilter.FACULTATIVE:
+        spans = []
+        pos = 0
+        for match in _pattern("facultative_signs").finditer(pseudo):
+            spans.append((pos, match.start()))
+            pos = match.end()
+        spans.append((pos, len(pseudo)))
+    res = []
+    positions = []
+    for start, end in spans:
+        for pos in range(start, end):
+            code = table.get(ord(pseudo[pos]), -1)
+            if code is not None:
+                res.append(pseudo[pos] if code == -1 else chr(code))
+                positions.append(pos)
+    return "".join(res), positions
+
+
+def pseudo_sort_key(pseudo: str, flags=0):  # see UmschString.sort_key
+    if not flags:
+        return pseudo.encode("utf_8")
+    return filter_pseudo(pseudo, flags).encode("utf_8") + b"\x00" + pseudo.encode("utf_8")
+
+
 class UmschString(array.array):
     def __getitem__(self, key):  # makes sure that slicing does not result in object type change
         if type(key) == slice:
@@ -396,33 +687,16 @@ class UmschString(array.array):
     def __new__(cls, initializer=[], source_format: Format = Format.UNICODE, flags=0):
         if type(initializer) == str:
             return UmschString._string_to_UmschrString(initializer, source_format, flags)
-        # Uses unsigned long ints to store 4-byte chars
-        return (super().__new__(cls, 'L', initializer))
+        # Uses unsigned ints to store 4-byte chars ('L' is 8 bytes wide on some platforms), so that the buffer
+        # holds native-endian UTF-32 and can be shared with memoryview and NumPy uint32 arrays
+        return (super().__new__(cls, 'I', initializer))
 
 # Imports data from a string to an Umschrift array
     def _string_to_UmschrString(value: str, source_format: Format = Format.UNICODE, flags=0):
-        i = 1
-        res = UmschString()
-        next_char = ord(value[0])
-        yod_flag = [0]
-        import_dict = IMPORT_DICT[source_format].copy()
-        if flags & UmImport.S_FOR_Z:
-            import_dict.update(IMPORT_DICT_S_FOR_Z[source_format])
-
-        while i <= len(value):
-            current_char = next_char
-            next_char = ord(value[i]) if i < (len(value)) else 0
-            converted_char = UmschString._import_char(
-                import_dict, current_char, next_char, source_format, yod_flag)
-            if (converted_char):
-                res.append(converted_char)
-            i += 1
-        return res
+        return get_codec(source_format, flags).import_string(value)
 
     def _import_char(import_dict, current_char, next_char, source_format, yod_flag):
-        ignored_chars = [UN_COMBINING_MACRON_BELOW, UN_COMBINING_CIRCUMFLEX_BELOW, UN_COMBINING_INVERTED_BREVE,
-                         UN_COMBINING_RIGHT_HALF_RING_ABOVE, UN_COMBINING_CYRILLIC_PSILI_PNEUMATA, UN_COMBINING_DOT_BELOW]
-        if current_char in ignored_chars:
+        if current_char in UN_COMBINING_CHARS:
             return 0
         if next_char == UN_COMBINING_MACRON_BELOW:
             return UN_DECODE_BEFORE_COMBINING_MACRON[current_char]
@@ -450,9 +724,15 @@ class UmschString(array.array):
         return current_char
 
     def to_pseudo(self):  # exports array as a string of pseudo characters that can be used for sorting and comparison using binary-based locales (for example in databases)
-        if byteorder == "little":
-            return self.tobytes().decode("utf_32_le")
-        return self.tobytes().decode("utf_32_be")
+        return _decode(self)
+
+    def to_utf32(self):  # returns the pseudo codes as native-endian UTF-32 bytes
+        return self.tobytes()
+
+    def to_numpy(self):
+        """Returns a NumPy uint32 array sharing the buffer of this UmschString (requires NumPy)."""
+        import numpy
+        return numpy.frombuffer(self, dtype=numpy.uint32)
 
     def to_unicode(self, flags=0):  # exports array content as a Unicode-formatted string
 
@@ -462,22 +742,10 @@ class UmschString(array.array):
         return self._export_string(Format.TRANSLITERATION, flags, True)
 
     def upper(self):
-        res = UmschString()
-        for char in self:
-            if (cased(char)):
-                res.append(char - (char & 1))
-            else:
-                res.append(char)
-        return res
+        return from_pseudo(_decode(self).translate(UPPER_TABLE))
 
     def lower(self):
-        res = UmschString()
-        for char in self:
-            if (cased(char)):
-                res.append(char + (~char & 1))
-            else:
-                res.append(char)
-        return res
+        return from_pseudo(_decode(self).translate(LOWER_TABLE))
 
     def index(self, sub: array.array, start=None, end=None):
         res = self.find(sub, start, end)
@@ -486,91 +754,55 @@ class UmschString(array.array):
         else:
             return res
 
-    def find_all(self, sub: array.array, start=None, end=None):
-        NOT_FOUND = -1
-        slice_start, _, _ = slice(start, end).indices(len(self))
-        pos = slice_start
+    def find_all(self, sub: array.array, start=None, end=None, overlapping=False):
+        if _probe is not None:
+            res = _probe(UmschString.find_all, self, sub, start, end, overlapping)
+            if res is not _UNMEASURED:
+                return res
+        slice_start, slice_end, _ = slice(start, end).indices(len(self))
+        pseudo = _decode(self)
+        pseudo_sub = _decode(sub)
+        step = 1 if overlapping else max(len(pseudo_sub), 1)
         res = []
-        while pos > NOT_FOUND:
-            pos = self.find(sub, pos, end)
-            if pos > NOT_FOUND:
-                res.append(pos)
-                pos += 1
+        pos = pseudo.find(pseudo_sub, slice_start, slice_end)
+        while pos != -1:
+            res.append(pos)
+            pos = pseudo.find(pseudo_sub, pos + step, slice_end)
         return res
 
     def find(self, sub: array.array, start=None, end=None):
+        if _probe is not None:
+            res = _probe(UmschString.find, self, sub, start, end)
+            if res is not _UNMEASURED:
+                return res
         slice_start, slice_end, _ = slice(start, end).indices(len(self))
-        pos = slice_start
-        sub_length = len(sub)
-        while pos <= slice_end-sub_length:
-            if self[pos:pos+sub_length] == sub:
-                return pos
-            pos += 1
-        return -1
+        return _decode(self).find(_decode(sub), slice_start, slice_end)
 
     def replace(self, old: array.array, new: array.array, count=None):
-        pos = 0
-        replaces = self.find_all(old)[None:count]
-        old_len = len(old)
-        res = UmschString()
-        for rep in replaces:
-            res.extend(self[pos:rep])
-            res.extend(new)
-            pos = rep + old_len
-        res.extend(self[pos:None])
-        return res
+        if _probe is not None:
+            res = _probe(UmschString.replace, self, old, new, count)
+            if res is not _UNMEASURED:
+                return res
+        return from_pseudo(_decode(self).replace(_decode(old), _decode(new), -1 if count is None else count))
 
     def filter(self, flags=0):
-        between_parentheses = False
-        filtered_signs = []
-        replaces = {}
-        res = UmschString()
-        if flags & UmFilter.MORPH:
-            filtered_signs.extend(
-                [PSEUDO_DOT, PSEUDO_COLON, PSEUDO_MIDDLE_DOT])
-        if flags & UmFilter.SUFF_PRON:
-            filtered_signs.extend([PSEUDO_SUFFIX_PRONOMEN_SEPARATOR])
-        if flags & UmFilter.BRACKETS:
-            filtered_signs.extend([PSEUDO_TOP_LEFT_HALF_BRACKET, PSEUDO_TOP_RIGHT_HALF_BRACKET, PSEUDO_LEFT_ANGLE_BRACKET, PSEUDO_RIGHT_ANGLE_BRACKET, ASC_LEFT_PARENTHESIS, ASC_RIGHT_PARENTHESIS,
-                                  ASC_LEFT_SQUARE_BRACKET, ASC_RIGHT_SQUARE_BRACKET, ASC_LESS_THAN_SIGN, ASC_GREATER_THAN_SIGN, ASC_LEFT_CURLY_BRACKET, ASC_RIGHT_CURLY_BRACKET, ASC_VERTICAL_LINE])
-        if flags & UmFilter.PUNCT:
-            filtered_signs.extend(
-                [PSEUDO_DOT, ASC_COMMA, ASC_QUESTION_MARK, ASC_EXCLAMATION_MARK, ASC_QUOTE])
-        if flags & UmFilter.DIGITS:
-            filtered_signs.extend(range(ASC_ZERO, ASC_NINE))
-        if flags & UmFilter.HYPHENS:
-            replaces.update({ASC_HYPHEN_MINUS: ASC_SPACE,
-                            UN_MINUS_SIGN: ASC_SPACE})
-            replaces.update(dict.fromkeys(
-                range(UN_HYPHEN, UN_HORIZONTAL_BAR), ASC_SPACE))
-        if flags & UmFilter.REPLACE_I_WITH_DIAERESIS:
-            replaces.update({PSEUDO_i_WITH_DIAERESIS: PSEUDO_y,
-                             PSEUDO_I_WITH_DIAERESIS: PSEUDO_Y})
-        if flags & UmFilter.REPLACE_INVERTED_BREVES:
-            replaces.update({PSEUDO_i_WITH_INVERTED_BREVE: PSEUDO_SMALL_YOD,
-                             PSEUDO_I_WITH_INVERTED_BREVE: PSEUDO_CAPITAL_YOD,
-                            PSEUDO_u_WITH_INVERTED_BREVE: PSEUDO_w,
-                            PSEUDO_U_WITH_INVERTED_BREVE: PSEUDO_W})
-        if flags & UmFilter.REPLACE_UNCERTAIN_CONSONANT:
-            replaces.update({PSEUDO_RIGHT_HALF_RING: PSEUDO_SMALL_ALEPH})
-        if flags & UmFilter.REPLACE_Z:
-            replaces.update({PSEUDO_Z: PSEUDO_S, PSEUDO_z: PSEUDO_s})
-
-        i = 0
-        while i < len(self):
-            char = self[i]
-            if (flags & UmFilter.FACULTATIVE) and between_parentheses:
-                between_parentheses = not (char == ASC_RIGHT_PARENTHESIS)
-            elif (flags & UmFilter.FACULTATIVE) and char == ASC_LEFT_PARENTHESIS:
-                between_parentheses = True
-            elif replaces and char in replaces:
-                res.append(replaces[char])
-            elif not char in filtered_signs:
-                res.append(char)
-            i += 1
-        if flags & UmFilter.LOWER:
-            return res.lower()
-        return res
+        return from_pseudo(filter_pseudo(_decode(self), flags))
+
+    def sort_key(self, flags=0):
+        """Returns a bytes sort key ordering like to_pseudo() strings. The pseudo codes are encoded in UTF-8, which keeps
+        the code point order in bytewise comparisons. With UmFilter flags the key is the filtered string,
+        followed by the original string as a tiebreak."""
+        return pseudo_sort_key(_decode(self), flags)
+
+    def compact(self):
+        """Returns an immutable CompactUmschString storing the codes with 1, 2 or 4 bytes per character."""
+        from .compact import CompactUmschString
+        return CompactUmschString._from_pseudo(_decode(self))
+
+    def freeze(self, intern: bool = False):
+        """Returns an immutable, hashable FrozenUmschString with the same content (the interned instance with intern)."""
+        frozen = FrozenUmschString._from_pseudo(_decode(self))
+        return frozen.intern() if intern else frozen
 
     def endswith(self, sub: array.array, start=None, end=None):
         slice_obj = slice(start, end)
@@ -588,38 +820,124 @@ class UmschString(array.array):
     # Exports data from an Umschrift array into a string
 
     def _export_string(self, output_format: Format, flags=0, discard_not_found: bool = False):
-        input = UmschString(self)
-
-        if flags & UmExport.REPLACE_I_WITH_DIAERESIS:
-
-            input = input.replace(UmschString([PSEUDO_I_WITH_DIAERESIS]), UmschString([PSEUDO_Y])).replace(
-                UmschString([PSEUDO_i_WITH_DIAERESIS]), UmschString([PSEUDO_y]))
-
-        if flags & UmExport.JJ_FOR_DOUBLE_YOD:
-            input = input.replace(UmschString([PSEUDO_y]), UmschString([ASC_j, ASC_j])).replace(UmschString([PSEUDO_Y]), UmschString([ASC_J, ASC_j])).replace(
-                UmschString([PSEUDO_I_WITH_DIAERESIS]), UmschString([ASC_J, ASC_j])).replace(UmschString([PSEUDO_i_WITH_DIAERESIS]), UmschString([ASC_j, ASC_j]))
-
-        if (not input):
-            return str()
-        res = array.array('L')
-        export_dict = EXPORT_DICT[output_format].copy()
-        if flags & UmExport.K_WITH_DOT:
-            export_dict.update(EXPORT_DICT_K_WITH_DOT[output_format])
-        if flags & UmExport.J_FOR_YOD:
-            export_dict.update(EXPORT_DICT_J_FOR_YOD[output_format])
-        if flags & UmExport.Z_FOR_S_AND_S_FOR_S_ACUTE:
-            export_dict.update(EXPORT_DICT_S_ACUTE[output_format])
-        export_multichar_dict = EXPORT_MULTICHAR_DICT[output_format].copy()
-        for char in input:
-            if (char in export_multichar_dict):
-                res.extend(export_multichar_dict[char])
-            elif (char in export_dict):
-                res.append((export_dict[char]))
-            elif (not discard_not_found):
-                res.append((char))
-        if byteorder == "little":
-            return res.tobytes().decode("utf_32_le")
-        return res.tobytes().decode("utf_32_be")
+        return export_pseudo(_decode(self), output_format, flags, discard_not_found)
+
+
+_INTERNED = WeakValueDictionary()
+
+
+class FrozenUmschString:
+    """Immutable, hashable counterpart of UmschString for use in sets and as dict keys. The pseudo codes are held
+    as a pseudo string, the hash and the filtered keys are computed once and cached."""
+    __slots__ = ("_pseudo", "_hash", "_keys", "__weakref__")
+
+    def __new__(cls, initializer=(), source_format: Format = Format.UNICODE, flags=0):
+        if type(initializer) == str:
+            return cls._from_pseudo(get_codec(source_format, flags).translate(initializer))
+        if isinstance(initializer, FrozenUmschString):
+            return initializer
+        if not isinstance(initializer, array.array):
+            initializer = array.array('I', initializer)
+        return cls._from_pseudo(_decode(initializer))
+
+    @classmethod
+    def _from_pseudo(cls, pseudo: str):
+        self = object.__new__(cls)
+        self._pseudo = pseudo
+        self._hash = hash(pseudo)
+        self._keys = None
+        return self
+
+    def intern(self):
+        """Returns the single shared instance of this value, so that repeated values (e.g. titles) are stored once."""
+        res = _INTERNED.get(self._pseudo)
+        if res is None:
+            _INTERNED[self._pseudo] = res = self
+        return res
+
+    def thaw(self):  # returns a mutable UmschString copy
+        return from_pseudo(self._pseudo)
+
+    def key(self, flags=0):
+        """Returns the pseudo string filtered with UmFilter flags, cached per flags."""
+        if not flags:
+            return self._pseudo
+        if self._keys is None:
+            self._keys = {}
+        res = self._keys.get(flags)
+        if res is None:
+            res = self._keys[flags] = filter_pseudo(self._pseudo, flags)
+        return res
+
+    def __hash__(self):
+        return self._hash
+
+    def __eq__(self, other):
+        if isinstance(other, FrozenUmschString):
+            return self._hash == other._hash and self._pseudo == other._pseudo
+        if isinstance(other, array.array):
+            return self._pseudo == _decode(other)
+        return NotImplemented
+
+    def __lt__(self, other):
+        if isinstance(other, FrozenUmschString):
+            return self._pseudo < other._pseudo
+        return NotImplemented
+
+    def __le__(self, other):
+        if isinstance(other, FrozenUmschString):
+            return self._pseudo <= other._pseudo
+        return NotImplemented
+
+    def __gt__(self, other):
+        if isinstance(other, FrozenUmschString):
+            return self._pseudo > other._pseudo
+        return NotImplemented
+
+    def __ge__(self, other):
+        if isinstance(other, FrozenUmschString):
+            return self._pseudo >= other._pseudo
+        return NotImplemented
+
+    def __len__(self):
+        return len(self._pseudo)
+
+    def __iter__(self):
+        return map(ord, self._pseudo)
+
+    def __getitem__(self, key):
+        if type(key) == slice:
+            return FrozenUmschString._from_pseudo(self._pseudo[key])
+        return ord(self._pseudo[key])
+
+    def __repr__(self):
+        return "FrozenUmschString(%r)" % self.to_unicode()
+
+    def to_pseudo(self):
+        return self._pseudo
+
+    def to_unicode(self, flags=0):
+        return export_pseudo(self._pseudo, Format.UNICODE, flags)
+
+    def to_transliteration(self, flags=0):
+        return export_pseudo(self._pseudo, Format.TRANSLITERATION, flags, True)
+
+    def filter(self, flags=0):
+        return FrozenUmschString._from_pseudo(self.key(flags))
+
+    def sort_key(self, flags=0):  # see UmschString.sort_key
+        return pseudo_sort_key(self._pseudo, flags)
+
+
+def freeze_many(items, source_format: Format = Format.UNICODE, flags=0, intern: bool = True):
+    """Returns FrozenUmschString objects for strings in the source format (or UmschString objects), interned by
+    default so that repeated values share one instance."""
+    codec = get_codec(source_format, flags)
+    res = []
+    for item in items:
+        frozen = FrozenUmschString._from_pseudo(codec.translate(item) if type(item) == str else _decode(item))
+        res.append(frozen.intern() if intern else frozen)
+    return res
 
 
 def cased(char: int):
@@ -629,8 +947,29 @@ def cased(char: int):
         return False
 
 
+# str.translate tables for case mapping of pseudo strings: case is the lowest bit of cased pseudo codes
+UPPER_TABLE = {char: char - (char & 1) for char in range(
+    PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1) if cased(char) and char & 1}
+LOWER_TABLE = {char: char + (~char & 1) for char in range(
+    PSEUDO_CAPITAL_ALEPH, PSEUDO_d_WITH_LINE + 1) if cased(char) and not char & 1}
+
+
 def from_pseudo(input: str):
-    return UmschString([ord(s) for s in input])
+    return UmschString(input.encode(_UTF_32, "surrogatepass"))
+
+
+def from_buffer(buffer):
+    """Returns an UmschString holding the pseudo codes of a buffer: bytes in native-endian UTF-32, or a memoryview,
+    array or NumPy array of 32-bit code points. The codes are copied in a single memcpy."""
+    view = memoryview(buffer)
+    res = UmschString()
+    if view.itemsize == 4:
+        res.frombytes(view.cast('B'))
+    elif view.itemsize == 1:
+        res.frombytes(view)
+    else:
+        res.extend(view.cast('B').cast(view.format))  # e.g. 8-byte 'L' arrays
+    return res
 
 
 def from_unicode(input: str, flags=0):